@@ -0,0 +1,300 @@
+"""
+Caché direccionada por contenido para libros subidos
+Cada archivo se identifica por el SHA-256 de sus bytes. Las hojas ya
+procesadas se guardan como Parquet en <data_dir>/cache/<hash>/, de modo que
+volver a subir el mismo archivo no obliga a recorrerlo otra vez.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+
+try:
+    from .dtypes import DEFAULT_MONEY_KEYWORDS, SheetSchema, rows_to_frame
+    from .settings import get_data_dir, get_setting
+except ImportError:
+    from dtypes import DEFAULT_MONEY_KEYWORDS, SheetSchema, rows_to_frame
+    from settings import get_data_dir, get_setting
+
+META_FILE = "meta.json"
+_cache = None
+
+
+def write_part(sheet_dir, index, table):
+    """Escribe una tabla Arrow como la parte número `index` de una hoja"""
+    # pyarrow se importa al usarlo: el servidor arranca sin cargarlo
+    import pyarrow.parquet as pq
+
+    pq.write_table(table, str(Path(sheet_dir) / f"part-{index:05d}.parquet"))
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class SheetWriter:
+    """
+    Convierte los lotes de una hoja a formato columnar y los escribe como partes.
+    Cada lote pasa por la etapa de tipos (dtypes.SheetSchema) antes de guardarse.
+    """
+
+    def __init__(self, sheet_dir, timer=None, money_keywords=None):
+        self.sheet_dir = Path(sheet_dir)
+        self.timer = timer
+        self.schema = SheetSchema(money_keywords or get_setting('backend.ingestion.money_columns',
+                                                                DEFAULT_MONEY_KEYWORDS))
+        self.columns = None
+        self.parts = 0
+        self.rows = 0
+
+    def _stage(self, name):
+        return self.timer.stage(name) if self.timer is not None else nullcontext()
+
+    def write(self, header, rows):
+        with self._stage('schema'):
+            frame = self.schema.optimize(rows_to_frame(header, rows))
+        import pyarrow as pa
+
+        with self._stage('cache_write'):
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.schema.widened:
+                self._widen_parts(self.schema.widened, table.schema)
+                self.schema.widened = set()
+            write_part(self.sheet_dir, self.parts, table)
+        self.columns = self.columns or table.column_names
+        self.parts += 1
+        self.rows += len(rows)
+
+    def _widen_parts(self, names, schema):
+        """Reescribe las partes ya escritas con esas columnas como texto, del mismo tipo que en `schema`"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        for index in range(self.parts):
+            path = self.sheet_dir / f"part-{index:05d}.parquet"
+            table = pq.read_table(str(path))
+            for name in names:
+                position = table.schema.get_field_index(name)
+                if position < 0:
+                    continue
+                column = table.column(position)
+                if pa.types.is_timestamp(column.type):
+                    column = pc.strftime(pc.cast(column, pa.timestamp('s'), safe=False), format='%Y-%m-%d %H:%M:%S')
+                field = schema.field(name)
+                table = table.set_column(position, field, column.cast(field.type))
+            write_part(self.sheet_dir, index, table)
+
+    def summary(self):
+        return {'columns': self.columns, 'parts': self.parts, 'rows': self.rows,
+                'schema': self.schema.report()}
+
+
+class CacheWriter:
+    """Escribe los lotes de una ingesta como partes Parquet en un directorio temporal"""
+
+    def __init__(self, cache, digest, timer=None):
+        self.cache = cache
+        self.digest = digest
+        self.timer = timer
+        self.tmp_dir = cache.directory / f".tmp-{digest}-{uuid.uuid4().hex[:8]}"
+        self.tmp_dir.mkdir(parents=True)
+        self.sheets = {}
+        self._writers = {}
+
+    def reserve_sheet(self, sheet_name):
+        """Crea (si hace falta) el directorio de una hoja y devuelve su entrada"""
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            sheet = {'name': sheet_name, 'dir': f"sheet_{len(self.sheets):03d}", 'parts': 0,
+                     'rows': 0, 'columns': None, 'schema': None}
+            self.sheets[sheet_name] = sheet
+            (self.tmp_dir / sheet['dir']).mkdir()
+        return sheet
+
+    def sheet_dir(self, sheet_name):
+        return self.tmp_dir / self.reserve_sheet(sheet_name)['dir']
+
+    def add_sheet_summary(self, sheet_name, summary):
+        """Registra una hoja escrita por otro proceso directamente en sheet_dir()"""
+        self.reserve_sheet(sheet_name).update(summary)
+
+    def on_chunk(self, sheet_name, header, rows):
+        """Callback compatible con ingestion.ingest_file"""
+        writer = self._writers.get(sheet_name)
+        if writer is None:
+            writer = self._writers[sheet_name] = SheetWriter(self.sheet_dir(sheet_name), self.timer)
+        writer.write(header, rows)
+        self.sheets[sheet_name].update(writer.summary())
+
+    def schema_report(self):
+        """Reporte de la etapa de tipos por hoja y total"""
+        sheets = {name: sheet['schema'] for name, sheet in self.sheets.items() if sheet['schema']}
+        before = sum(report['bytes_before'] for report in sheets.values())
+        after = sum(report['bytes_after'] for report in sheets.values())
+        return {
+            'sheets': sheets,
+            'bytes_before': before,
+            'bytes_after': after,
+            'saved_ratio': round((before - after) / before, 4) if before else 0.0,
+        }
+
+    def commit(self, summary):
+        """Publica la entrada en la caché junto con el resumen de la ingesta"""
+        meta = {
+            'digest': self.digest,
+            'created_at': time.time(),
+            'size_bytes': _dir_size(self.tmp_dir),
+            'sheets': [sheet for sheet in self.sheets.values() if sheet['columns'] is not None],
+            'summary': summary,
+        }
+        with open(self.tmp_dir / META_FILE, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, default=str)
+        self.cache.publish(self.digest, self.tmp_dir)
+        return meta
+
+    def abort(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class WorkbookCache:
+    """
+    Caché de libros en formato columnar con límite de tamaño y expulsión LRU.
+    El último acceso de cada entrada es el mtime de su meta.json.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, digest):
+        if not digest or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Hash inválido: {digest!r}")
+        return self.directory / digest
+
+    def lookup(self, digest):
+        """Devuelve los metadatos de la entrada (y la marca como usada) o None"""
+        meta_path = self._entry_dir(digest) / META_FILE
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return meta
+
+    def writer(self, digest, timer=None):
+        return CacheWriter(self, digest, timer)
+
+    def publish(self, digest, tmp_dir):
+        """Mueve una entrada terminada a su sitio definitivo y aplica el límite"""
+        target = self._entry_dir(digest)
+        with self._lock:
+            if target.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                os.replace(tmp_dir, target)
+            self._evict(keep=digest)
+
+    def read_sheet(self, digest, sheet_name):
+        """Lee una hoja cacheada como tabla Arrow"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        meta = self.lookup(digest)
+        if meta is None:
+            return None
+        for sheet in meta['sheets']:
+            if sheet['name'] == sheet_name:
+                sheet_dir = self._entry_dir(digest) / sheet['dir']
+                tables = [pq.read_table(str(part)) for part in sorted(sheet_dir.glob("part-*.parquet"))]
+                return pa.concat_tables(tables, promote_options="permissive")
+        return None
+
+    def iter_sheet_batches(self, digest, sheet_name, batch_rows=65536):
+        """Recorre una hoja cacheada por RecordBatches, sin cargarla entera en memoria"""
+        import pyarrow.parquet as pq
+
+        meta = self.lookup(digest)
+        sheet = next((s for s in (meta or {}).get('sheets', []) if s['name'] == sheet_name), None)
+        if sheet is None:
+            return
+        sheet_dir = self._entry_dir(digest) / sheet['dir']
+        for part in sorted(sheet_dir.glob("part-*.parquet")):
+            yield from pq.ParquetFile(str(part)).iter_batches(batch_size=batch_rows)
+
+    def entries(self):
+        """Lista las entradas de la caché, de la más reciente a la más antigua"""
+        items = []
+        for entry in self.directory.iterdir():
+            meta_path = entry / META_FILE
+            if entry.name.startswith('.') or not meta_path.exists():
+                continue
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as file:
+                    meta = json.load(file)
+            except json.JSONDecodeError:
+                continue
+            items.append({
+                'digest': entry.name,
+                'size_bytes': meta.get('size_bytes', 0),
+                'last_access': meta_path.stat().st_mtime,
+                'filename': meta.get('summary', {}).get('filename'),
+                'rows': meta.get('summary', {}).get('rows'),
+                'sheets': [sheet['name'] for sheet in meta.get('sheets', [])],
+            })
+        items.sort(key=lambda item: item['last_access'], reverse=True)
+        return items
+
+    def stats(self):
+        items = self.entries()
+        return {
+            'entries': len(items),
+            'total_bytes': sum(item['size_bytes'] for item in items),
+            'max_bytes': self.max_bytes,
+            'items': items,
+        }
+
+    def _evict(self, keep=None):
+        """Elimina las entradas menos usadas hasta quedar por debajo del límite"""
+        items = self.entries()
+        total = sum(item['size_bytes'] for item in items)
+        for item in reversed(items):
+            if total <= self.max_bytes:
+                break
+            if item['digest'] == keep:
+                continue
+            shutil.rmtree(self.directory / item['digest'], ignore_errors=True)
+            total -= item['size_bytes']
+
+    def purge(self, digest=None):
+        """Elimina una entrada concreta o toda la caché; devuelve cuántas se borraron"""
+        with self._lock:
+            if digest is not None:
+                target = self._entry_dir(digest)
+                if not target.exists():
+                    return 0
+                shutil.rmtree(target, ignore_errors=True)
+                return 1
+            removed = 0
+            for entry in self.directory.iterdir():
+                # Los directorios .tmp-* pertenecen a ingestas en curso
+                if entry.is_dir() and not entry.name.startswith('.'):
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+            return removed
+
+
+def get_workbook_cache():
+    """Devuelve la caché de libros configurada (backend.cache.*)"""
+    global _cache
+    if _cache is None:
+        max_mb = float(get_setting('backend.cache.max_mb', 1024))
+        _cache = WorkbookCache(get_data_dir("cache"), int(max_mb * 1024 * 1024))
+    return _cache
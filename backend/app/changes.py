@@ -0,0 +1,214 @@
+"""
+Canal de cambios en vivo (Server-Sent Events)
+Cuando una ingesta cambia ventas, inventario o saldos se publica un evento
+con el cambio (meses de ventas afectados con sus nuevos totales, filas por
+tabla, resumen del libro de saldos). Hay un único publicador y un búfer
+circular compartido: cada suscriptor solo guarda su posición en el búfer.
+El búfer es una tabla de SQLite (change_events), así los suscriptores de
+cualquier worker de uvicorn ven los cambios publicados por otro.
+
+Un cliente lento no hace crecer la memoria del servidor: la respuesta SSE no
+genera el siguiente evento hasta haber enviado el anterior, y si el búfer da
+la vuelta antes de que el cliente lo alcance recibe un evento 'resync' para
+que vuelva a pedir los datos completos.
+"""
+import asyncio
+import json
+import threading
+import time
+
+try:
+    from .cube import get_sales_cube
+    from .ledger import ledger_summary
+    from .settings import get_setting
+    from .storage import get_storage
+except ImportError:
+    from cube import get_sales_cube
+    from ledger import ledger_summary
+    from settings import get_setting
+    from storage import get_storage
+
+TOPICS = ('sales', 'inventory', 'customers', 'balances')
+# Cada cuánto mira un suscriptor si otro proceso publicó algo
+POLL_SECONDS = 0.5
+_feed = None
+_feed_lock = threading.Lock()
+
+
+class TooManySubscribers(Exception):
+    """Se alcanzó el máximo de suscriptores simultáneos"""
+
+
+def _format_event(event, data, event_id=None):
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class ChangeFeed:
+    """Búfer circular de eventos en SQLite con número de secuencia y aviso a los suscriptores"""
+
+    def __init__(self, storage, buffer_size, max_subscribers, heartbeat_seconds):
+        self.storage = storage
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat_seconds = heartbeat_seconds
+        self._waiters = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+
+    def publish(self, payload):
+        """Añade un evento y despierta a los suscriptores (se puede llamar desde cualquier hilo)"""
+        with self.storage.transaction() as conn:
+            seq = conn.execute("INSERT INTO change_events (at, payload) VALUES (?, ?)",
+                               (time.time(), json.dumps(payload, default=str))).lastrowid
+            conn.execute("DELETE FROM change_events WHERE seq <= ?", (seq - self.buffer_size,))
+        with self._lock:
+            self.published += 1
+            waiters = list(self._waiters)
+        # Los suscriptores de este proceso se despiertan al momento; los de otros, en su siguiente consulta
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # El event loop del suscriptor ya se cerró
+                pass
+        return seq
+
+    def latest(self):
+        with self.storage.pool.connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_events'").fetchone()
+        return row[0] if row else 0
+
+    def since(self, seq):
+        """Eventos posteriores a `seq`, si se perdieron algunos por dar la vuelta el búfer y la última secuencia"""
+        with self.storage.pool.connection() as conn:
+            rows = conn.execute("SELECT seq, at, payload FROM change_events WHERE seq > ? ORDER BY seq",
+                                (seq,)).fetchall()
+            oldest = conn.execute("SELECT MIN(seq) FROM change_events").fetchone()[0]
+        events = [{'seq': row['seq'], 'at': row['at'], **json.loads(row['payload'])} for row in rows]
+        latest = events[-1]['seq'] if events else seq
+        return events, oldest is not None and seq + 1 < oldest, latest
+
+    async def stream(self, request, topics=TOPICS, last_event_id=None):
+        """
+        Genera los eventos SSE de un suscriptor: 'ready' al conectar, 'change'
+        por cada cambio de los temas pedidos, 'resync' si se quedó atrás y un
+        comentario periódico para mantener viva la conexión.
+        """
+        wake = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wake)
+        with self._lock:
+            if len(self._waiters) >= self.max_subscribers:
+                raise TooManySubscribers(f"Hay {self.max_subscribers} suscriptores conectados; inténtalo más tarde")
+            self._waiters.add(waiter)
+        try:
+            latest = await asyncio.to_thread(self.latest)
+        except BaseException:
+            with self._lock:
+                self._waiters.discard(waiter)
+            raise
+        cursor = latest if last_event_id is None else min(last_event_id, latest)
+
+        async def generate():
+            nonlocal cursor
+            try:
+                yield _format_event('ready', {'seq': cursor, 'topics': list(topics)}, cursor)
+                quiet_since = time.monotonic()
+                while not await request.is_disconnected():
+                    wake.clear()
+                    # Las consultas a SQLite van en un hilo para no bloquear el event loop
+                    events, missed, latest = await asyncio.to_thread(self.since, cursor)
+                    if missed:
+                        self.resyncs += 1
+                        cursor = latest
+                        quiet_since = time.monotonic()
+                        yield _format_event('resync', {'seq': latest}, latest)
+                        continue
+                    for event in events:
+                        cursor = event['seq']
+                        if set(event['tables']) & set(topics):
+                            quiet_since = time.monotonic()
+                            yield _format_event('change', event, cursor)
+                    try:
+                        await asyncio.wait_for(wake.wait(), POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        if time.monotonic() - quiet_since >= self.heartbeat_seconds:
+                            quiet_since = time.monotonic()
+                            yield ": ping\n\n"
+            finally:
+                with self._lock:
+                    self._waiters.discard(waiter)
+
+        return generate()
+
+    def stats(self):
+        with self.storage.pool.connection() as conn:
+            buffered = conn.execute("SELECT COUNT(*) FROM change_events").fetchone()[0]
+        latest = self.latest()
+        with self._lock:
+            return {
+                'seq': latest,
+                'buffered': buffered,
+                'buffer_size': self.buffer_size,
+                'subscribers': len(self._waiters),
+                'max_subscribers': self.max_subscribers,
+                'published': self.published,
+                'resyncs': self.resyncs,
+            }
+
+
+def _sales_delta(months):
+    """Totales mensuales nuevos de los meses que cambiaron"""
+    # pandas se importa al usarlo: el servidor arranca sin cargarlo
+    import pandas as pd
+
+    start = pd.Period(min(months), freq='M')
+    end = pd.Period(max(months), freq='M')
+    result = get_sales_cube().query('month', (), None, start.start_time.date(), end.end_time.date())
+    return [row for row in result['values'] if row['period'][:7] in months]
+
+
+def build_change_event(changed):
+    """Evento con el cambio a partir de las etiquetas de una ingesta ('sales:2026-03', 'inventory', ...)"""
+    tables = sorted({tag.partition(':')[0] for tag in changed})
+    storage = get_storage()
+    counts = storage.counts()
+    event = {
+        'changed': list(changed),
+        'tables': tables,
+        'counts': {table: counts[table] for table in tables if table in counts},
+    }
+    months = sorted({tag.partition(':')[2] for tag in changed if tag.startswith('sales:')})
+    if months:
+        event['sales'] = _sales_delta(months)
+    if 'balances' in tables:
+        event['balances'] = ledger_summary(storage)
+    return event
+
+
+def publish_changes(changed):
+    """Publica el cambio de una ingesta; no hace nada si no cambió ningún dato"""
+    if not changed:
+        return None
+    try:
+        event = build_change_event(changed)
+    except Exception as e:
+        # Los datos ya se cargaron: sin el detalle se avisa igualmente del cambio
+        print(f"⚠️ No se pudo calcular el detalle del cambio: {e}")
+        event = {'changed': list(changed), 'tables': sorted({tag.partition(':')[0] for tag in changed})}
+    return get_change_feed().publish(event)
+
+
+def get_change_feed():
+    """Devuelve el canal de cambios configurado (backend.events.*)"""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = ChangeFeed(
+                get_storage(),
+                buffer_size=int(get_setting('backend.events.buffer', 256)),
+                max_subscribers=int(get_setting('backend.events.max_subscribers', 100)),
+                heartbeat_seconds=float(get_setting('backend.events.heartbeat_seconds', 15)),
+            )
+    return _feed
@@ -0,0 +1,120 @@
+"""
+Agrupación de peticiones idénticas simultáneas ("single flight")
+Si llegan a la vez varias peticiones con los mismos parámetros, solo la
+primera ejecuta el cálculo; las demás esperan ese mismo cálculo y reciben su
+resultado (o su error). En cuanto termina, la siguiente petición vuelve a
+calcular (para guardar resultados está result_cache).
+
+Sirve para rutas síncronas (que FastAPI ejecuta en su pool de hilos) y
+asíncronas:
+
+    @app.get("/sales/indicator")
+    @coalesce
+    def read_sales_indicator(grain: str = "month"): ...
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import Future
+
+from starlette.requests import Request
+
+
+class SingleFlight:
+    """Cálculos en curso por clave; cada uno es un Future que comparten quienes esperan"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """Devuelve (future, es_el_primero)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, function, *args, **kwargs):
+        """Ejecuta function(*args, **kwargs) salvo que ya haya un cálculo igual en curso"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, function, *args, **kwargs):
+        """Versión para corrutinas; espera sin bloquear el event loop"""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await function(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+_flight = SingleFlight()
+
+
+def _key_part(value):
+    # De un Request importa la URL (ruta + query) y la versión que ya tiene el cliente
+    if isinstance(value, Request):
+        return f"{value.url}#{value.headers.get('if-none-match', '')}"
+    return repr(value)
+
+
+def coalesce(function):
+    """
+    Decorador para rutas de FastAPI: las llamadas simultáneas con los mismos
+    argumentos comparten un único cálculo. Conserva la firma, así FastAPI
+    sigue viendo los mismos parámetros.
+    """
+    signature = inspect.signature(function)
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    def make_key(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return name + '(' + ','.join(f"{key}={_key_part(value)}" for key, value in bound.arguments.items()) + ')'
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            return await _flight.do_async(make_key(args, kwargs), function, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return _flight.do(make_key(args, kwargs), function, *args, **kwargs)
+    return wrapper
+
+
+def single_flight_stats():
+    return _flight.stats()
@@ -0,0 +1,398 @@
+"""
+Cubo OLAP precalculado para el Indicador de Ventas
+Las ventas se agregan por periodo (día/semana/mes) × producto × cliente ×
+tienda en todas las combinaciones de dimensiones ("cuboides"), y cada
+cuboide se guarda en <data_dir>/cube/<cuboide>/ como un Parquet por mes.
+Una consulta se responde desde el cuboide materializado más pequeño que la
+contiene, nunca recorriendo las ventas originales, y cada lote nuevo se
+fusiona solo con los meses que trae, sin reescribir el resto.
+
+El manifiesto dice qué archivo vale para cada mes; los archivos nuevos se
+escriben con otro nombre y reemplazar el manifiesto confirma la fusión entera
+de una vez (un fallo a medias no deja meses sumados dos veces).
+
+Entre procesos (workers de uvicorn y de ingesta) las fusiones se ordenan con
+un cerrojo de archivo junto al directorio del cubo, no con una transacción de
+SQLite: la fusión tarda segundos y no debe frenar al resto de escrituras.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import combinations
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from .settings import get_data_dir
+    from .storage import TABLES, bump_data_versions, iter_sheet_rows, match_table
+except ImportError:
+    from settings import get_data_dir
+    from storage import TABLES, bump_data_versions, iter_sheet_rows, match_table
+
+MANIFEST_FILE = "manifest.json"
+GRAINS = ('day', 'week', 'month')
+DIMENSIONS = ('sku', 'customer_code', 'store')
+MEASURES = ('amount_cents', 'quantity', 'lines')
+# Periodos que se pueden obtener a partir de cada grano (la semana no se
+# puede pasar a mes porque una semana puede caer en dos meses)
+DERIVABLE = {'day': ('day', 'week', 'month'), 'week': ('week',), 'month': ('month',)}
+REBUILD_BATCH_ROWS = 100000
+_cube = None
+_cube_lock = threading.Lock()
+
+
+class CubeQueryError(ValueError):
+    """Grano, dimensión o rango de fechas inválido"""
+
+
+def period_start(dates, grain):
+    """Inicio del periodo de cada fecha: el mismo día, el lunes de su semana o el día 1 del mes"""
+    # pandas y pyarrow se importan al usarlos: el servidor arranca sin cargarlos
+    import pandas as pd
+
+    dates = pd.to_datetime(dates, errors='coerce').dt.normalize()
+    if grain == 'week':
+        return dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+    if grain == 'month':
+        return dates - pd.to_timedelta(dates.dt.day - 1, unit='D')
+    return dates
+
+
+def cuboid_name(grain, dims):
+    return f"{grain}-{'_'.join(dims) if dims else 'all'}"
+
+
+def all_cuboids():
+    """Todas las combinaciones grano × subconjunto de dimensiones"""
+    return [
+        (grain, dims)
+        for grain in GRAINS
+        for size in range(len(DIMENSIONS), -1, -1)
+        for dims in combinations(DIMENSIONS, size)
+    ]
+
+
+def sales_frame(rows):
+    """DataFrame con las columnas de la tabla de ventas listo para agregar"""
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(rows, columns=list(TABLES['sales']['columns']))
+    frame['period'] = period_start(frame['sale_date'], 'day')
+    frame = frame[frame['period'].notna()]
+    for column in DIMENSIONS:
+        frame[column] = frame[column].astype('string')
+    frame['amount_cents'] = pd.to_numeric(frame['amount_cents'], errors='coerce').fillna(0).astype('int64')
+    frame['quantity'] = pd.to_numeric(frame['quantity'], errors='coerce').fillna(0).astype('int64')
+    frame['lines'] = 1
+    return frame[['period', *DIMENSIONS, *MEASURES]]
+
+
+def _rollup(frame, grain, dims, source_grain='day'):
+    """Agrega un DataFrame (de grano `source_grain`) al grano y dimensiones pedidos"""
+    keys = ['period', *dims]
+    if grain != source_grain:
+        frame = frame.assign(period=period_start(frame['period'], grain))
+    return frame.groupby(keys, dropna=False, sort=False, observed=True)[list(MEASURES)].sum().reset_index()
+
+
+class SalesCube:
+    """
+    Conjunto de cuboides en disco con un manifiesto (filas por cuboide,
+    archivo de cada mes y hashes de los archivos ya fusionados, para que
+    fusionar sea idempotente).
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Cerrojo de archivo (<cubo>.lock) para fusionar o reconstruir: un solo
+        escritor del cubo a la vez entre todos los procesos y hilos
+        """
+        with open(self.directory.with_name(f"{self.directory.name}.lock"), 'a+b') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK se rinde tras unos 10 segundos: se vuelve a esperar
+                        time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def manifest(self):
+        try:
+            with open(self.directory / MANIFEST_FILE, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'version': 0, 'cuboids': {}, 'partitions': {}, 'merged': []}
+
+    def _read(self, name, manifest, months=None):
+        """Lee los meses de un cuboide (todos, o los de `months`) según el manifiesto"""
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        partitions = manifest['partitions'].get(name, {})
+        files = [part['file'] for month, part in sorted(partitions.items()) if months is None or month in months]
+        if not files:
+            return None
+        return pd.concat([pq.read_table(str(self.directory / name / file)).to_pandas() for file in files],
+                         ignore_index=True)
+
+    def is_built(self):
+        return bool(self.manifest()['cuboids'])
+
+    def is_merged(self, digest):
+        return digest in self.manifest()['merged']
+
+    def merge(self, frame, digest=None):
+        """
+        Fusiona un lote de ventas (salida de sales_frame) con todos los cuboides.
+        Cada cuboide se calcula desde el delta diario del lote y se suma solo a
+        los meses que el lote toca; cada mes se escribe en un archivo nuevo y
+        el manifiesto, reemplazado al final, los confirma todos a la vez.
+        Devuelve False si el lote (por hash) ya estaba fusionado. Entre
+        procesos, el llamador debe tener el cerrojo exclusive().
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock:
+            manifest = self.manifest()
+            if digest is not None and digest in manifest['merged']:
+                return False
+            finest = _rollup(frame, 'day', DIMENSIONS)
+            written = []
+            obsolete = []
+            try:
+                for grain, dims in all_cuboids():
+                    name = cuboid_name(grain, dims)
+                    delta = _rollup(finest, grain, dims)
+                    partitions = manifest['partitions'].setdefault(name, {})
+                    (self.directory / name).mkdir(exist_ok=True)
+                    months = delta['period'].dt.strftime('%Y-%m')
+                    for month, part in delta.groupby(months, sort=False):
+                        existing = partitions.get(month)
+                        if existing is not None:
+                            previous = self.directory / name / existing['file']
+                            part = pd.concat([pq.read_table(str(previous)).to_pandas(), part], ignore_index=True)
+                            obsolete.append(previous)
+                        part = _rollup(part, grain, dims, grain).sort_values(['period', *dims], ignore_index=True)
+                        file = f"{month}-{uuid.uuid4().hex[:8]}.parquet"
+                        pq.write_table(pa.Table.from_pandas(part, preserve_index=False), str(self.directory / name / file))
+                        written.append(self.directory / name / file)
+                        partitions[month] = {'file': file, 'rows': len(part)}
+                    manifest['cuboids'][name] = sum(part['rows'] for part in partitions.values())
+                if digest is not None:
+                    manifest['merged'].append(digest)
+                manifest['version'] += 1
+                self._write_manifest(manifest)
+            except BaseException:
+                for path in written:
+                    path.unlink(missing_ok=True)
+                raise
+            # Los lectores que aún usan el manifiesto anterior vuelven a leerlo (query)
+            for path in obsolete:
+                path.unlink(missing_ok=True)
+            return True
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.directory / f".tmp-{MANIFEST_FILE}"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, self.directory / MANIFEST_FILE)
+
+    def clear(self):
+        with self._lock:
+            version = self.manifest()['version']
+            for path in self.directory.rglob("*.parquet"):
+                path.unlink()
+            self._write_manifest({'version': version + 1, 'cuboids': {}, 'partitions': {}, 'merged': []})
+
+    def nearest_cuboid(self, grain, dims, start=None, end=None):
+        """
+        Cuboide materializado más pequeño que responde a la consulta: su grano
+        debe poder agregarse al pedido, debe tener todas las dimensiones usadas y
+        los límites de fecha deben caer en inicios de periodo de ese grano.
+        """
+        import pandas as pd
+
+        cuboids = self.manifest()['cuboids']
+        candidates = []
+        for source_grain, source_dims in all_cuboids():
+            name = cuboid_name(source_grain, source_dims)
+            if name not in cuboids or grain not in DERIVABLE[source_grain]:
+                continue
+            if not set(dims) <= set(source_dims):
+                continue
+            bounds = [bound for bound in (start, end + pd.Timedelta(days=1) if end is not None else None)
+                      if bound is not None]
+            if any(period_start(pd.Series([bound]), source_grain).iloc[0] != bound for bound in bounds):
+                continue
+            candidates.append((cuboids[name], source_grain, source_dims))
+        if not candidates:
+            return None
+        _, source_grain, source_dims = min(candidates)
+        return source_grain, source_dims
+
+    def query(self, grain='month', by=(), filters=None, start=None, end=None):
+        """
+        Agrega las ventas por periodo y las dimensiones de `by`.
+
+        Args:
+            grain: 'day', 'week' o 'month'
+            by: Dimensiones por las que desglosar (sku, customer_code, store)
+            filters: {dimensión: [valores]} para filtrar (drill-down)
+            start, end: Fechas (inclusive) para acotar el rango
+
+        Returns:
+            Dict con 'values' (lista de filas), 'source' (cuboide usado) y 'version'
+        """
+        import pandas as pd
+
+        filters = {dim: values for dim, values in (filters or {}).items() if values}
+        if grain not in GRAINS:
+            raise CubeQueryError(f"Grano inválido '{grain}'. Opciones: {', '.join(GRAINS)}")
+        unknown = [dim for dim in [*by, *filters] if dim not in DIMENSIONS]
+        if unknown:
+            raise CubeQueryError(f"Dimensiones desconocidas: {', '.join(unknown)}. Opciones: {', '.join(DIMENSIONS)}")
+        start = pd.Timestamp(start).normalize() if start else None
+        end = pd.Timestamp(end).normalize() if end else None
+
+        by = [dim for dim in DIMENSIONS if dim in by]
+        needed = [dim for dim in DIMENSIONS if dim in by or dim in filters]
+        manifest = self.manifest()
+        nearest = self.nearest_cuboid(grain, needed, start, end)
+        if nearest is None:
+            return {'values': [], 'source': None, 'version': manifest['version']}
+        source_grain, source_dims = nearest
+        name = cuboid_name(source_grain, source_dims)
+        for attempt in range(2):
+            # Un periodo cae en el mes de su inicio: solo se leen los meses del rango
+            months = None
+            if start is not None or end is not None:
+                months = {month for month in manifest['partitions'].get(name, {})
+                          if (start is None or month >= start.strftime('%Y-%m'))
+                          and (end is None or month <= end.strftime('%Y-%m'))}
+            try:
+                frame = self._read(name, manifest, months)
+                break
+            except FileNotFoundError:
+                # Una fusión reemplazó esos meses mientras tanto: se usa el manifiesto nuevo
+                if attempt:
+                    raise
+                manifest = self.manifest()
+        if frame is None:
+            return {'values': [], 'source': name, 'version': manifest['version']}
+
+        mask = pd.Series(True, index=frame.index)
+        for dim, values in filters.items():
+            mask &= frame[dim].isin(values)
+        if start is not None:
+            mask &= frame['period'] >= start
+        if end is not None:
+            mask &= frame['period'] <= end
+        result = _rollup(frame[mask], grain, by, source_grain).sort_values(['period', *by], ignore_index=True)
+        result['period'] = result['period'].dt.strftime('%Y-%m-%d')
+        result = result.astype(object).where(result.notna(), None)
+        return {
+            'values': result.to_dict(orient='records'),
+            'source': cuboid_name(source_grain, source_dims),
+            'version': manifest['version'],
+        }
+
+    def stats(self):
+        manifest = self.manifest()
+        return {
+            'version': manifest['version'],
+            'merged_files': len(manifest['merged']),
+            'cuboids': manifest['cuboids'],
+            'size_bytes': sum(path.stat().st_size for path in self.directory.rglob("*.parquet")),
+        }
+
+
+def merge_cached_sales(cube, storage, cache, digest):
+    """
+    Fusiona en el cubo las hojas de ventas de una entrada de la caché.
+    El cerrojo de archivo del cubo evita que dos procesos lo reescriban a la
+    vez; en SQLite solo se sube la versión del cubo, en una transacción corta.
+    Devuelve los meses (AAAA-MM) que recibieron ventas nuevas.
+    """
+    import pandas as pd
+
+    meta = cache.lookup(digest)
+    if meta is None:
+        return []
+    frames = []
+    for sheet in meta['sheets']:
+        if match_table(sheet['name']) != 'sales':
+            continue
+        rows = iter_sheet_rows(cache, digest, sheet, 'sales')
+        if rows is not None:
+            frames.append(sales_frame(rows))
+    if not frames:
+        return []
+    frame = pd.concat(frames, ignore_index=True)
+    with cube.exclusive():
+        merged = cube.merge(frame, digest)
+    if merged:
+        with storage.transaction() as conn:
+            bump_data_versions(conn, ['cube'])
+    return sorted(frame['period'].dt.strftime('%Y-%m').unique().tolist()) if merged else []
+
+
+def rebuild_from_storage(cube, storage, batch_rows=REBUILD_BATCH_ROWS):
+    """Reconstruye el cubo desde la tabla de ventas (solo hace falta si se borró)"""
+    columns = ', '.join(TABLES['sales']['columns'])
+    with cube.exclusive(), storage.pool.connection() as conn:
+        # Transacción de lectura: una foto coherente de las ventas que no bloquea a los escritores (WAL)
+        conn.execute("BEGIN")
+        cube.clear()
+        merged_digests = [row[0] for row in conn.execute("SELECT digest FROM ingested_files")]
+        cursor = conn.execute(f"SELECT {columns} FROM sales")
+        total = 0
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            cube.merge(sales_frame([tuple(row) for row in rows]))
+            total += len(rows)
+        conn.rollback()
+        manifest = cube.manifest()
+        manifest['merged'] = merged_digests
+        cube._write_manifest(manifest)
+    with storage.transaction() as conn:
+        bump_data_versions(conn, ['cube'])
+    return total
+
+
+def get_sales_cube():
+    """Devuelve el cubo de ventas en <data_dir>/cube"""
+    global _cube
+    with _cube_lock:
+        if _cube is None:
+            _cube = SalesCube(get_data_dir("cube"))
+    return _cube
@@ -0,0 +1,122 @@
+"""
+Reducción de puntos de series temporales para los gráficos
+Un gráfico no necesita más puntos que píxeles. Con `max_points` las series
+se reducen en el servidor conservando su forma:
+
+- lttb: Largest-Triangle-Three-Buckets. Divide la serie en cubetas y en cada
+  una elige el punto que forma el triángulo de mayor área con el punto
+  elegido antes y el promedio de la cubeta siguiente (picos y valles se ven)
+- minmax: en cada cubeta conserva el mínimo y el máximo (totalmente vectorizado)
+
+El primer y el último punto se conservan siempre.
+numpy y pandas se importan dentro de las funciones: el servidor arranca sin cargarlos.
+"""
+
+METHODS = ('lttb', 'minmax')
+MIN_POINTS = 3
+
+
+class DownsampleError(ValueError):
+    """Método o número de puntos inválido"""
+
+
+def _bucket_edges(length, buckets):
+    """Límites de `buckets` cubetas sobre los puntos 1..length-2 (sin el primero ni el último)"""
+    import numpy as np
+
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x, y, max_points):
+    """Índices elegidos por LTTB; el cálculo de áreas de cada cubeta es vectorizado"""
+    import numpy as np
+
+    length = len(x)
+    if max_points >= length or length <= MIN_POINTS:
+        return np.arange(length)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _bucket_edges(length, max_points - 2)
+    # Promedio de cada cubeta (la "siguiente" de la última es el último punto)
+    sums_x = np.add.reduceat(x[:-1], edges[:-1])
+    sums_y = np.add.reduceat(y[:-1], edges[:-1])
+    counts = np.diff(edges)
+    next_x = np.append((sums_x / counts)[1:], x[-1])
+    next_y = np.append((sums_y / counts)[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x[bucket]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[bucket] - ay))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    selected[-1] = length - 1
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """Índices del mínimo y el máximo de cada cubeta, en orden"""
+    import numpy as np
+
+    length = len(y)
+    if max_points >= length or length <= MIN_POINTS:
+        return np.arange(length)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _bucket_edges(length, max(1, (max_points - 2) // 2))
+    inner = np.arange(1, length - 1)
+    bucket = np.searchsorted(edges, inner, side='right') - 1
+    # Ordenar por (cubeta, valor): el primero de cada cubeta es el mínimo y el último el máximo
+    order = np.lexsort((y[inner], bucket))
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    last = np.r_[first[1:] - 1, len(order) - 1]
+    chosen = inner[np.concatenate([order[first], order[last]])]
+    return np.unique(np.concatenate([[0], chosen, [length - 1]]))
+
+
+def _x_values(values):
+    """Eje X numérico: fechas -> segundos, números tal cual"""
+    import numpy as np
+    import pandas as pd
+
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64)
+    dates = pd.to_datetime(series, errors='coerce')
+    return dates.to_numpy(dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+
+
+def downsample_rows(rows, max_points, x='period', y='amount_cents', group_by=(), method='lttb'):
+    """
+    Reduce una lista de filas (dicts ordenados por `x`) a unos `max_points`
+    puntos en total. Con `group_by` cada serie se reduce por separado y el
+    presupuesto se reparte entre las series.
+    """
+    if method not in METHODS:
+        raise DownsampleError(f"Método desconocido '{method}'. Opciones: {', '.join(METHODS)}")
+    if max_points < MIN_POINTS:
+        raise DownsampleError(f"max_points debe ser al menos {MIN_POINTS}")
+    if len(rows) <= max_points:
+        return rows
+    import numpy as np
+
+    series = {}
+    for index, row in enumerate(rows):
+        series.setdefault(tuple(row.get(key) for key in group_by), []).append(index)
+    budget = max(MIN_POINTS, max_points // len(series))
+
+    keep = []
+    for indices in series.values():
+        indices = np.asarray(indices)
+        if method == 'lttb':
+            xs = _x_values([rows[i][x] for i in indices])
+            ys = np.array([rows[i][y] or 0 for i in indices], dtype=np.float64)
+            chosen = lttb_indices(xs, ys, budget)
+        else:
+            ys = np.array([rows[i][y] or 0 for i in indices], dtype=np.float64)
+            chosen = minmax_indices(ys, budget)
+        keep.append(indices[chosen])
+    return [rows[i] for i in np.sort(np.concatenate(keep))]
@@ -0,0 +1,212 @@
+"""
+Inferencia y reducción de tipos para los datos ingeridos
+Por defecto pandas carga los números como float64/int64 y el texto como
+objetos Python. Esta etapa decide un tipo compacto por columna a partir del
+primer lote de cada hoja y lo aplica a todos los lotes:
+
+- texto de baja cardinalidad -> category
+- enteros -> el ancho más pequeño que los contiene (int8/int16/int32)
+- fechas -> datetime64, con el formato detectado una sola vez
+- dinero -> enteros en centavos (la columna pasa a llamarse <columna>_cents)
+
+Los códigos con ceros a la izquierda ("00017") se quedan como texto. Si un
+lote posterior trae valores que no encajan en el tipo inferido (un código
+"CX01" en una columna que parecía numérica) la columna se amplía a texto; en
+una columna de dinero es un error de datos (SchemaError). Nunca se convierte
+un valor a vacío en silencio.
+"""
+import re
+
+DEFAULT_MONEY_KEYWORDS = (
+    'precio', 'valor', 'monto', 'importe', 'total', 'saldo', 'costo', 'pago', 'abono',
+    'price', 'amount', 'balance', 'cost', 'payment',
+)
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 10000
+DATE_MIN_MATCH = 0.9
+_DECIMAL_COMMA_RE = re.compile(r'^-?\d{1,3}(\.\d{3})*(,\d+)?$|^-?\d+(,\d+)?$')
+# "00017" es un código, no el número 17 ("0,5" y "0.5" sí son números)
+_LEADING_ZERO_RE = re.compile(r'^[+-]?0\d')
+
+
+class SchemaError(ValueError):
+    """Un lote trae valores que no caben en el tipo de su columna"""
+
+
+def rows_to_frame(header, rows):
+    """Crea un DataFrame con los tipos que pandas elegiría por defecto"""
+    # pandas se importa al usarlo: el servidor arranca sin cargarlo
+    import pandas as pd
+
+    return pd.DataFrame.from_records(rows, columns=list(header))
+
+
+def frame_bytes(frame):
+    """Memoria real que ocupa el DataFrame (incluye el contenido de los objetos)"""
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+
+def _is_money_column(name, keywords):
+    name = name.lower()
+    return any(keyword in name for keyword in keywords)
+
+
+def _to_number(series):
+    """Convierte texto a número aceptando coma decimal ("1.234,56"); None si no se puede"""
+    import pandas as pd
+
+    values = series.dropna()
+    if values.empty:
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    converted = pd.to_numeric(series, errors='coerce')
+    if converted.notna().sum() == len(values):
+        return converted
+    text = values.astype(str).str.strip()
+    if text.str.match(_DECIMAL_COMMA_RE).all():
+        normalized = series.astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        return pd.to_numeric(normalized.where(series.notna()), errors='coerce')
+    return None
+
+
+def _is_identifier(series):
+    """Texto con ceros a la izquierda: se guarda tal cual para no perderlos"""
+    values = series.dropna()
+    if values.empty or not values.map(lambda value: isinstance(value, str)).any():
+        return False
+    return bool(values.astype(str).str.strip().str.match(_LEADING_ZERO_RE).any())
+
+
+def _downcast_integer(series):
+    """Reduce un entero al ancho mínimo; usa enteros con nulos si hay vacíos"""
+    import pandas as pd
+
+    if series.isna().any():
+        series = series.astype('Int64')
+    return pd.to_numeric(series, downcast='integer')
+
+
+def _is_integral(series):
+    import numpy as np
+
+    values = series.dropna()
+    return values.empty or bool(np.all(np.mod(values.to_numpy(dtype='float64'), 1) == 0))
+
+
+class SheetSchema:
+    """
+    Reglas de tipo de una hoja. Se infieren con el primer lote y se aplican
+    igual a los siguientes, acumulando los bytes antes y después. Las
+    columnas que un lote posterior obliga a ampliar a texto quedan en
+    `widened` para que quien escribió los lotes anteriores los convierta.
+    """
+
+    def __init__(self, money_keywords=DEFAULT_MONEY_KEYWORDS):
+        self.money_keywords = tuple(keyword.lower() for keyword in money_keywords)
+        self.rules = None
+        self.widened = set()
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def _infer_rule(self, name, series):
+        import pandas as pd
+        from pandas.tseries.api import guess_datetime_format
+
+        values = series.dropna()
+        if values.empty:
+            return {'type': 'text'}
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return {'type': 'date', 'format': None}
+        if pd.api.types.is_bool_dtype(series):
+            return {'type': 'bool'}
+
+        number = None if _is_identifier(series) else _to_number(series)
+        if number is not None:
+            if _is_money_column(name, self.money_keywords):
+                return {'type': 'money'}
+            return {'type': 'integer' if _is_integral(number) else 'float'}
+
+        text = values.astype(str)
+        date_format = guess_datetime_format(text.iloc[0], dayfirst=True)
+        if date_format is not None:
+            parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+            if parsed.notna().mean() >= DATE_MIN_MATCH:
+                return {'type': 'date', 'format': date_format}
+        elif values.map(lambda value: hasattr(value, 'year')).all():
+            return {'type': 'date', 'format': None}
+
+        unique = text.nunique()
+        if unique <= CATEGORY_MAX_UNIQUE and unique <= len(text) * CATEGORY_MAX_RATIO:
+            return {'type': 'category'}
+        return {'type': 'text'}
+
+    def _apply_rule(self, series, rule):
+        import pandas as pd
+
+        kind = rule['type']
+        if kind == 'date':
+            if rule['format'] is None:
+                return pd.to_datetime(series, errors='coerce')
+            return pd.to_datetime(series.astype('string'), format=rule['format'], errors='coerce')
+        if kind in ('integer', 'float', 'money'):
+            number = _to_number(series)
+            if number is None:
+                number = pd.to_numeric(series, errors='coerce')
+            if kind == 'money':
+                return _downcast_integer((number * 100).round())
+            if kind == 'integer' and _is_integral(number):
+                return _downcast_integer(number)
+            return number.astype('float64')
+        if kind == 'category':
+            return series.astype('string').astype('category')
+        if kind == 'bool':
+            return series.astype('boolean')
+        return series.astype('string')
+
+    def optimize(self, frame):
+        """Aplica las reglas (infiriéndolas si es el primer lote) y devuelve el nuevo DataFrame"""
+        import pandas as pd
+
+        if self.rules is None:
+            self.rules = {name: self._infer_rule(name, frame[name]) for name in frame.columns}
+        self.bytes_before += frame_bytes(frame)
+        columns = {}
+        for name in frame.columns:
+            rule = self.rules.get(name, {'type': 'text'})
+            target = f"{name}_cents" if rule['type'] == 'money' else name
+            columns[target] = self._apply_rule(frame[name], rule)
+            if rule['type'] in ('text', 'category', 'bool'):
+                continue
+            # Valores que tenían dato y la conversión dejó vacíos
+            lost = frame[name].notna() & columns[target].isna()
+            if rule['type'] in ('integer', 'float') and not lost.any() and _is_identifier(frame[name]):
+                lost = frame[name].astype(str).str.strip().str.match(_LEADING_ZERO_RE).fillna(False)
+            if lost.any():
+                sample = frame[name][lost].iloc[0]
+                if rule['type'] == 'money':
+                    raise SchemaError(f"La columna de importes '{name}' tiene valores no numéricos "
+                                      f"(p. ej. {sample!r})")
+                self.rules[name] = {'type': 'text'}
+                self.widened.add(name)
+                columns[target] = self._apply_rule(frame[name], self.rules[name])
+        optimized = pd.DataFrame(columns)
+        self.bytes_after += frame_bytes(optimized)
+        return optimized
+
+    def report(self):
+        """Resumen de la etapa: reglas aplicadas y memoria antes/después"""
+        saved = self.bytes_before - self.bytes_after
+        return {
+            'columns': {name: rule['type'] for name, rule in (self.rules or {}).items()},
+            'bytes_before': self.bytes_before,
+            'bytes_after': self.bytes_after,
+            'saved_ratio': round(saved / self.bytes_before, 4) if self.bytes_before else 0.0,
+        }
+
+
+def optimize_frame(frame, money_keywords=DEFAULT_MONEY_KEYWORDS):
+    """Atajo para un DataFrame completo: devuelve (DataFrame optimizado, reporte)"""
+    schema = SheetSchema(money_keywords)
+    optimized = schema.optimize(frame)
+    return optimized, schema.report()
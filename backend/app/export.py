@@ -0,0 +1,150 @@
+"""
+Exportación a Excel por streaming
+Usa el libro de solo escritura de openpyxl: cada fila leída del cursor de
+SQLite se escribe a disco al momento, y al guardar el .xlsx se comprime
+directamente hacia la respuesta HTTP por bloques. La memoria no depende del
+número de filas exportadas.
+
+Las cabeceras usan los nombres que reconoce la ingesta (fecha, cliente,
+precio, ...) y el dinero vuelve a unidades, así un archivo exportado se
+puede volver a subir tal cual.
+"""
+import io
+import queue
+import threading
+from datetime import date
+
+try:
+    from .storage import COLUMN_ALIASES, SHEET_ALIASES, TABLES
+except ImportError:
+    from storage import COLUMN_ALIASES, SHEET_ALIASES, TABLES
+
+FETCH_ROWS = 5000
+QUEUE_CHUNKS = 16
+DATE_COLUMNS = ('sale_date', 'entry_date', 'due_date')
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Filtros admitidos por tabla: parámetro -> condición SQL
+EXPORT_FILTERS = {
+    'sales': {'start': "sale_date >= ?", 'end': "sale_date <= ?", 'store': "store = ?"},
+    'inventory': {'category': "category = ?"},
+    'customers': {'city': "city = ?"},
+    'balances': {'customer_code': "customer_code = ?", 'start': "entry_date >= ?", 'end': "entry_date <= ?"},
+}
+
+
+class ExportError(ValueError):
+    """Tabla o filtro de exportación inválido"""
+
+
+class _QueueWriter(io.RawIOBase):
+    """Archivo de solo escritura que entrega cada bloque escrito a una cola acotada"""
+
+    def __init__(self, chunks, cancelled):
+        self.chunks = chunks
+        self.cancelled = cancelled
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        chunk = bytes(data)
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.5)
+                return len(chunk)
+            except queue.Full:
+                continue
+        raise OSError("Exportación cancelada")
+
+
+def _header(column):
+    return COLUMN_ALIASES.get(column, (column,))[0]
+
+
+def _cell(column, value):
+    if value is None:
+        return None
+    if column.endswith('_cents'):
+        return value / 100
+    if column in DATE_COLUMNS and isinstance(value, str) and len(value) == 10:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def build_export_query(table, filters):
+    """SQL y parámetros para exportar una tabla con los filtros pedidos"""
+    if table not in TABLES:
+        raise ExportError(f"Tabla desconocida '{table}'. Opciones: {', '.join(TABLES)}")
+    allowed = EXPORT_FILTERS.get(table, {})
+    unknown = [key for key in filters if key not in allowed]
+    if unknown:
+        raise ExportError(f"Filtros no válidos para '{table}': {', '.join(unknown)}")
+    conditions = [(allowed[key], value) for key, value in filters.items() if value not in (None, '')]
+    sql = f"SELECT {', '.join(TABLES[table]['columns'])} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(condition for condition, _ in conditions)
+    return sql + " ORDER BY id", [value for _, value in conditions]
+
+
+def _write_workbook(storage, table, sql, params, output):
+    # openpyxl se importa al exportar: el servidor arranca sin cargarlo
+    from openpyxl import Workbook
+
+    columns = TABLES[table]['columns']
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_ALIASES[table][0])
+    sheet.append([_header(column) for column in columns])
+    with storage.pool.connection() as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                sheet.append([_cell(column, value) for column, value in zip(columns, row)])
+    workbook.save(output)
+
+
+def iter_xlsx_export(storage, table, filters=None):
+    """
+    Genera los bytes del .xlsx por bloques. El libro se escribe en un hilo
+    aparte; la cola acotada frena al escritor si el cliente lee más despacio,
+    y si el cliente se desconecta el escritor se detiene.
+    """
+    sql, params = build_export_query(table, filters or {})
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            _write_workbook(storage, table, sql, params, _QueueWriter(chunks, cancelled))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            while not cancelled.is_set():
+                try:
+                    chunks.put(done, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def generate():
+        writer = threading.Thread(target=produce, daemon=True)
+        writer.start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is done:
+                    break
+                yield chunk
+            if errors and not cancelled.is_set():
+                raise errors[0]
+        finally:
+            cancelled.set()
+
+    return generate()
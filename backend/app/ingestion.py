@@ -0,0 +1,416 @@
+"""
+Ingesta por streaming de archivos Excel/CSV
+El archivo subido se vuelca a disco por bloques y luego se recorre en lotes
+de filas de tamaño fijo, así la memoria no crece con el tamaño del archivo.
+"""
+import csv
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from xml.etree import ElementTree
+
+try:
+    from .cache import SheetWriter, get_workbook_cache
+    from .cube import get_sales_cube, merge_cached_sales
+    from .ledger import sync_ledger
+    from .settings import get_setting
+    from .storage import get_storage, load_cached_workbook, match_table
+except ImportError:
+    from cache import SheetWriter, get_workbook_cache
+    from cube import get_sales_cube, merge_cached_sales
+    from ledger import sync_ledger
+    from settings import get_setting
+    from storage import get_storage, load_cached_workbook, match_table
+
+SPOOL_BLOCK_BYTES = 1024 * 1024
+DEFAULT_CHUNK_ROWS = 5000
+XLSX_EXTENSIONS = {'.xlsx', '.xlsm'}
+CSV_EXTENSIONS = {'.csv'}
+SUPPORTED_EXTENSIONS = XLSX_EXTENSIONS | CSV_EXTENSIONS
+READ_ERRORS = (OSError, KeyError, ValueError, zipfile.BadZipFile)
+_DIMENSION_RE = re.compile(rb'<dimension ref="[A-Z]+\d+(?::[A-Z]+(\d+))?"')
+_ROW_TAG_RE = re.compile(rb'<(?:\w+:)?row[\s>]')
+# Bytes del XML de la hoja que se leen para estimar sus filas
+ESTIMATE_SAMPLE_BYTES = 64 * 1024
+
+
+class IngestionError(Exception):
+    """Error de formato o contenido del archivo a ingerir"""
+
+
+class StageTimer:
+    """Acumula la duración (en segundos) de cada etapa de la ingesta"""
+
+    def __init__(self):
+        self.timings = {}
+
+    def add(self, name, seconds):
+        self.timings[name] = round(self.timings.get(name, 0.0) + seconds, 6)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+def check_extension(filename: str) -> str:
+    """Valida la extensión del archivo y la devuelve en minúsculas"""
+    suffix = Path(filename or '').suffix.lower()
+    if suffix == '.xls':
+        raise IngestionError("El formato .xls no está soportado; guarda el archivo como .xlsx")
+    if suffix not in SUPPORTED_EXTENSIONS:
+        raise IngestionError(f"Extensión no soportada: '{suffix or filename}'")
+    return suffix
+
+
+async def spool_upload(upload, directory: Path):
+    """
+    Copia un UploadFile a un archivo temporal en disco, bloque a bloque,
+    calculando el SHA-256 del contenido a medida que se recibe.
+
+    Returns:
+        Tupla (ruta, tamaño en bytes, hash hexadecimal)
+    """
+    suffix = check_extension(upload.filename)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=str(directory))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                block = await upload.read(SPOOL_BLOCK_BYTES)
+                if not block:
+                    break
+                out.write(block)
+                digest.update(block)
+                size += len(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return Path(path), size, digest.hexdigest()
+
+
+def _batched(iterable, size):
+    """Agrupa un iterable en listas de como máximo `size` elementos"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _normalize_header(header):
+    """Convierte la fila de encabezado en nombres de columna únicos y no vacíos"""
+    names = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = str(value).strip() if value is not None else ''
+        name = name or f"columna_{index + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _is_empty_row(row):
+    return all(value is None or value == '' for value in row)
+
+
+def _iter_xlsx_chunks(path, chunk_rows, sheet_names=None):
+    """Recorre las hojas de un .xlsx (o solo `sheet_names`) en modo solo lectura"""
+    # openpyxl se importa al leer el primer .xlsx: el servidor arranca sin cargarlo
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(str(path), read_only=True, data_only=True)
+    except InvalidFileException as e:
+        raise IngestionError(f"No se pudo leer el archivo: {e}") from e
+    try:
+        for worksheet in workbook.worksheets:
+            if sheet_names is not None and worksheet.title not in sheet_names:
+                continue
+            rows = (row for row in worksheet.iter_rows(values_only=True) if not _is_empty_row(row))
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = _normalize_header(header)
+            width = len(header)
+            for batch in _batched(rows, chunk_rows):
+                yield worksheet.title, header, [tuple(row[:width]) for row in batch]
+    finally:
+        workbook.close()
+
+
+def _sniff_dialect(handle):
+    """Detecta el separador del CSV (las exportaciones en español suelen usar ';')"""
+    sample = handle.read(64 * 1024)
+    handle.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        first_line = sample.split('\n', 1)[0]
+        dialect = type('SniffedDialect', (csv.excel,), {})
+        dialect.delimiter = max(',;\t|', key=first_line.count)
+        return dialect
+
+
+def _iter_csv_chunks(path, chunk_rows, sheet_name):
+    """Recorre un CSV en lotes de filas"""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as handle:
+        reader = csv.reader(handle, _sniff_dialect(handle))
+        rows = (row for row in reader if not _is_empty_row(row))
+        header = next(rows, None)
+        if header is None:
+            return
+        header = _normalize_header(header)
+        width = len(header)
+        for batch in _batched(rows, chunk_rows):
+            yield sheet_name, header, [tuple(row[:width]) + (None,) * (width - len(row)) for row in batch]
+
+
+def iter_row_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, source_name=None, sheet_names=None):
+    """
+    Genera lotes (hoja, encabezado, filas) de como máximo `chunk_rows` filas.
+
+    Args:
+        path: Ruta del archivo (.xlsx/.xlsm/.csv)
+        chunk_rows: Número máximo de filas por lote
+        source_name: Nombre original del archivo (da nombre a la "hoja" de un CSV)
+        sheet_names: Limita la lectura de un .xlsx a estas hojas
+    """
+    suffix = check_extension(str(path))
+    if suffix in CSV_EXTENSIONS:
+        return _iter_csv_chunks(path, chunk_rows, Path(source_name or path).stem)
+    return _iter_xlsx_chunks(path, chunk_rows, sheet_names)
+
+
+def list_xlsx_sheets(path):
+    """Nombres de las hojas de un .xlsx leídos de xl/workbook.xml (sin cargar el libro)"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    except READ_ERRORS + (ElementTree.ParseError,) as e:
+        raise IngestionError(f"No se pudo leer el archivo: {e}") from e
+    return [element.get('name') for element in root.iter() if element.tag.endswith('}sheet')]
+
+
+def estimate_total_rows(path):
+    """
+    Estima el número de filas sin recorrer el archivo con openpyxl.
+    En .xlsx lee la etiqueta <dimension> del inicio de cada hoja; si no la
+    tiene (p. ej. libros escritos por openpyxl en modo write-only) extrapola
+    las filas de los primeros 64 KB del XML a su tamaño descomprimido. En CSV
+    cuenta saltos de línea. Devuelve None si no se puede estimar.
+    """
+    suffix = check_extension(str(path))
+    try:
+        if suffix in CSV_EXTENSIONS:
+            total = 0
+            with open(path, 'rb') as handle:
+                for block in iter(lambda: handle.read(SPOOL_BLOCK_BYTES), b''):
+                    total += block.count(b'\n')
+            return max(total - 1, 0)
+        total = 0
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if not (name.startswith('xl/worksheets/') and name.endswith('.xml')):
+                    continue
+                with archive.open(name) as sheet_xml:
+                    head = sheet_xml.read(ESTIMATE_SAMPLE_BYTES)
+                match = _DIMENSION_RE.search(head, 0, 4096)
+                if match is not None:
+                    total += max(int(match.group(1) or 1) - 1, 0)
+                    continue
+                rows = len(_ROW_TAG_RE.findall(head))
+                size = archive.getinfo(name).file_size
+                if size > len(head):
+                    if not rows:
+                        return None
+                    rows = round(rows * size / len(head))
+                total += max(rows - 1, 0)
+        return total
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def ingest_file(path, chunk_rows=DEFAULT_CHUNK_ROWS, on_chunk=None, timer=None, source_name=None,
+                progress=None):
+    """
+    Recorre el archivo completo por lotes y devuelve un resumen por hoja.
+
+    Args:
+        path: Ruta del archivo en disco
+        chunk_rows: Filas por lote
+        on_chunk: Callback opcional on_chunk(hoja, encabezado, filas) por cada lote
+        timer: StageTimer donde acumular tiempos (se crea uno si no se pasa)
+        source_name: Nombre original del archivo subido
+        progress: Callback opcional progress(etapa, filas_procesadas)
+    """
+    timer = timer or StageTimer()
+    sheets = {}
+    rows_done = 0
+    callback_seconds = 0.0
+    started = time.perf_counter()
+    chunks = iter_row_chunks(path, chunk_rows, source_name)
+    try:
+        for sheet_name, header, rows in chunks:
+            sheet = sheets.setdefault(sheet_name, {'name': sheet_name, 'columns': header, 'rows': 0})
+            sheet['rows'] += len(rows)
+            if on_chunk is not None:
+                # El callback registra sus propias etapas; 'parse' mide solo la lectura
+                callback_started = time.perf_counter()
+                on_chunk(sheet_name, header, rows)
+                callback_seconds += time.perf_counter() - callback_started
+            rows_done += len(rows)
+            if progress is not None:
+                progress('parse', rows_done)
+    except READ_ERRORS as e:
+        raise IngestionError(f"No se pudo leer el archivo: {e}") from e
+    timer.add('parse', time.perf_counter() - started - callback_seconds)
+    return {
+        'rows': sum(sheet['rows'] for sheet in sheets.values()),
+        'sheets': list(sheets.values()),
+        'timings': timer.timings,
+    }
+
+
+def _parse_sheet_worker(path, sheet_name, sheet_dir, chunk_rows):
+    """
+    Se ejecuta en un proceso hijo: recorre una sola hoja y escribe sus lotes
+    como partes Parquet en `sheet_dir`. Solo devuelve el resumen, nunca los datos.
+    """
+    writer = SheetWriter(sheet_dir)
+    for _, header, batch in iter_row_chunks(path, chunk_rows, sheet_names={sheet_name}):
+        writer.write(header, batch)
+    return sheet_name, writer.summary()
+
+
+def ingest_sheets_parallel(path, writer, chunk_rows=DEFAULT_CHUNK_ROWS, workers=2, timer=None,
+                           progress=None):
+    """
+    Reparte las hojas de un .xlsx entre procesos. Cada proceso escribe su hoja
+    directamente en el directorio de la entrada de caché, así la unión de
+    resultados se limita a combinar resúmenes (no se copian tablas entre procesos).
+    """
+    timer = timer or StageTimer()
+    sheet_names = list_xlsx_sheets(path)
+    # Reservar los directorios en el orden del libro
+    sheet_dirs = {name: str(writer.sheet_dir(name)) for name in sheet_names}
+    rows_done = 0
+    with timer.stage('parse'):
+        try:
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(sheet_names)))) as pool:
+                futures = [
+                    pool.submit(_parse_sheet_worker, str(path), name, sheet_dirs[name], chunk_rows)
+                    for name in sheet_names
+                ]
+                for future in as_completed(futures):
+                    sheet_name, summary = future.result()
+                    writer.add_sheet_summary(sheet_name, summary)
+                    rows_done += summary['rows']
+                    if progress is not None:
+                        progress('parse', rows_done)
+        except READ_ERRORS as e:
+            raise IngestionError(f"No se pudo leer el archivo: {e}") from e
+    sheets = [
+        {'name': sheet['name'], 'columns': sheet['columns'], 'rows': sheet['rows']}
+        for sheet in writer.sheets.values() if sheet['columns'] is not None
+    ]
+    return {
+        'rows': sum(sheet['rows'] for sheet in sheets),
+        'sheets': sheets,
+        'timings': timer.timings,
+    }
+
+
+def ingest_cached(path, digest, chunk_rows=DEFAULT_CHUNK_ROWS, timer=None, source_name=None,
+                  progress=None):
+    """
+    Igual que ingest_file, pero consulta primero la caché columnar por hash.
+    En un fallo, cada lote se escribe como Parquet mientras se recorre el archivo;
+    con backend.ingestion.parallel_sheets las hojas de un .xlsx se leen en paralelo.
+    """
+    timer = timer or StageTimer()
+    cache = get_workbook_cache()
+    with timer.stage('cache_lookup'):
+        meta = cache.lookup(digest)
+    if meta is not None:
+        storage, changed = _load_into_storage(cache, digest, source_name, timer, progress)
+        return {**meta['summary'], 'digest': digest, 'cache': 'hit', 'storage': storage,
+                'changed': changed, 'timings': timer.timings}
+
+    writer = cache.writer(digest, timer)
+    try:
+        workers = 1
+        if get_setting('backend.ingestion.parallel_sheets', False) and check_extension(str(path)) in XLSX_EXTENSIONS:
+            # Sin workers configurados, un proceso por hoja hasta el número de CPUs:
+            # con una sola CPU los procesos solo añaden coste y se lee en serie
+            workers = min(int(get_setting('backend.ingestion.workers') or os.cpu_count() or 1),
+                          len(list_xlsx_sheets(path)))
+        if workers > 1:
+            result = ingest_sheets_parallel(path, writer, chunk_rows, workers, timer, progress)
+        else:
+            result = ingest_file(path, chunk_rows, writer.on_chunk, timer, source_name, progress)
+        result['schema'] = writer.schema_report()
+        if progress is not None:
+            progress('cache_store', result['rows'])
+        with timer.stage('cache_store'):
+            summary = {key: value for key, value in result.items() if key != 'timings'}
+            writer.commit({**summary, 'filename': source_name})
+    except BaseException:
+        writer.abort()
+        raise
+    storage, changed = _load_into_storage(cache, digest, source_name, timer, progress)
+    return {**result, 'digest': digest, 'cache': 'miss', 'storage': storage, 'changed': changed}
+
+
+def _has_sales(cache, digest):
+    meta = cache.lookup(digest) or {}
+    return any(match_table(sheet['name']) == 'sales' for sheet in meta.get('sheets', []))
+
+
+def _load_into_storage(cache, digest, source_name, timer, progress):
+    """
+    Carga las hojas reconocidas (ventas, inventario, ...) en SQLite una vez por
+    archivo, fusiona las ventas en el cubo y aplica los saldos al libro.
+    Devuelve (filas por tabla, etiquetas de los datos que cambiaron), p. ej.
+    ['sales:2026-03', 'inventory'], para invalidar los resultados que dependen de ellos.
+    """
+    if progress is not None:
+        progress('storage')
+    storage = get_storage()
+    with timer.stage('storage'):
+        loaded = load_cached_workbook(storage, cache, digest, source_name)
+    changed = [table for table, rows in loaded.items() if rows and table != 'sales']
+    cube = get_sales_cube()
+    # La carga y la fusión no comparten transacción: si la fusión falló o el
+    # proceso murió entre ambas, el archivo ya figura como cargado pero su hash
+    # no está en el manifiesto del cubo, y al volver a subirlo se reintenta
+    if loaded.get('sales') or (not cube.is_merged(digest) and _has_sales(cache, digest)):
+        if progress is not None:
+            progress('cube')
+        with timer.stage('cube'):
+            months = merge_cached_sales(cube, storage, cache, digest)
+        if loaded.get('sales') or months:
+            changed.extend([f"sales:{month}" for month in months] or ['sales'])
+    if loaded.get('balances'):
+        if progress is not None:
+            progress('ledger')
+        with timer.stage('ledger'):
+            sync_ledger(storage)
+    return loaded, changed
@@ -0,0 +1,335 @@
+"""
+Trabajos de ingesta en segundo plano
+Un archivo subido se encola como trabajo y se procesa en un pool de procesos
+(la lectura de Excel es intensiva en CPU). Los procesos hijos informan el
+progreso por una cola compartida que un hilo del servidor va aplicando.
+
+El estado de cada trabajo se guarda en SQLite (ingest_jobs): con varios
+workers de uvicorn cualquiera de ellos puede responder por un trabajo que
+encoló otro.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .changes import publish_changes
+    from .ingestion import estimate_total_rows, ingest_cached
+    from .result_cache import get_result_cache
+    from .settings import get_setting
+    from .storage import StorageBusy, get_storage
+except ImportError:
+    from changes import publish_changes
+    from ingestion import estimate_total_rows, ingest_cached
+    from result_cache import get_result_cache
+    from settings import get_setting
+    from storage import StorageBusy, get_storage
+
+FINISHED_STATES = ('done', 'error')
+MAX_FINISHED_JOBS = 100
+# Intentos al guardar el progreso si SQLite sigue bloqueado tras su espera
+# (otro worker escribiendo); el resultado final se reintenta sin límite
+PROGRESS_SAVE_ATTEMPTS = 3
+MAX_RETRY_SLEEP = 5.0
+_manager = None
+_manager_lock = threading.Lock()
+_progress_queue = None
+# Identifica esta ejecución del servidor; los workers la heredan del proceso padre.
+# Los trabajos sin terminar de una ejecución anterior se dan por interrumpidos
+RUN_ID = os.environ.setdefault('CUBO_SERVER_RUN', uuid.uuid4().hex)
+
+
+class JobQueueFull(Exception):
+    """Se alcanzó el máximo de trabajos pendientes"""
+
+
+def _is_locked(error):
+    if isinstance(error, StorageBusy):
+        return True
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+
+def _retry_locked(action, *args, attempts=None):
+    """Ejecuta `action` reintentando mientras SQLite esté bloqueado (sin límite si attempts es None)"""
+    attempt = 0
+    while True:
+        try:
+            return action(*args)
+        except Exception as e:
+            attempt += 1
+            if not _is_locked(e) or (attempts is not None and attempt >= attempts):
+                raise
+            time.sleep(min(0.5 * 2 ** (attempt - 1), MAX_RETRY_SLEEP))
+
+
+class Job:
+    """Estado de un trabajo de ingesta"""
+
+    def __init__(self, filename, path, digest, size_bytes):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.digest = digest
+        self.size_bytes = size_bytes
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.rows = 0
+        self.total_rows = None
+        self.eta_seconds = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Se incrementa en cada cambio; los suscriptores SSE lo comparan
+        self.version = 0
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 1.0
+        if not self.total_rows:
+            return None
+        return min(self.rows / self.total_rows, 0.99)
+
+    def update(self, **changes):
+        for key, value in changes.items():
+            setattr(self, key, value)
+        progress = self.progress
+        if self.status == 'running' and self.started_at and progress:
+            elapsed = time.time() - self.started_at
+            self.eta_seconds = round(elapsed / progress * (1 - progress), 1)
+        elif self.status in FINISHED_STATES:
+            self.eta_seconds = 0 if self.status == 'done' else None
+        self.version += 1
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'digest': self.digest,
+            'size_bytes': self.size_bytes,
+            'status': self.status,
+            'stage': self.stage,
+            'rows': self.rows,
+            'total_rows': self.total_rows,
+            'progress': self.progress,
+            'eta_seconds': self.eta_seconds,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+def _init_worker(progress_queue):
+    """Inicializador de cada proceso del pool"""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_ingest_job(job_id, path, digest, chunk_rows, source_name):
+    """Se ejecuta en un proceso hijo: ingiere el archivo y publica el progreso"""
+    def report(stage, rows=None):
+        update = {'stage': stage}
+        if rows is not None:
+            update['rows'] = rows
+        _progress_queue.put((job_id, update))
+
+    _progress_queue.put((job_id, {'status': 'running', 'stage': 'estimate', 'started_at': time.time()}))
+    _progress_queue.put((job_id, {'total_rows': estimate_total_rows(path)}))
+    report('parse', 0)
+    return ingest_cached(path, digest, chunk_rows, source_name=source_name, progress=report)
+
+
+class JobManager:
+    """
+    Cola de trabajos con concurrencia acotada.
+    Como mucho `max_workers` trabajos se procesan a la vez en cada proceso del
+    servidor y como mucho `max_pending` pueden estar en cola o en curso (en total).
+    """
+
+    def __init__(self, max_workers, max_pending, chunk_rows, storage=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.chunk_rows = chunk_rows
+        self.storage = storage or get_storage()
+        # Trabajos de este proceso (los demás solo se leen de SQLite)
+        self.jobs = {}
+        context = multiprocessing.get_context()
+        self._queue = context.Queue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._queue,),
+        )
+        self._abandon_previous_runs()
+        self._drain_thread = threading.Thread(target=self._drain_progress, daemon=True)
+        self._drain_thread.start()
+
+    def _abandon_previous_runs(self):
+        """Marca como error los trabajos que quedaron a medias al reiniciar el servidor"""
+        with self.storage.transaction() as conn:
+            rows = conn.execute(
+                f"SELECT id, state FROM ingest_jobs WHERE run_id != ? "
+                f"AND status NOT IN ({', '.join('?' for _ in FINISHED_STATES)})",
+                (RUN_ID, *FINISHED_STATES),
+            ).fetchall()
+            for row in rows:
+                state = {**json.loads(row['state']), 'status': 'error', 'stage': 'error', 'eta_seconds': None,
+                         'error': "Interrumpido al reiniciar el servidor"}
+                conn.execute("UPDATE ingest_jobs SET status = 'error', version = version + 1, state = ? WHERE id = ?",
+                             (json.dumps(state, default=str), row['id']))
+
+    def _save(self, job, conn=None):
+        sql = ("INSERT INTO ingest_jobs (id, run_id, status, version, created_at, state) VALUES (?, ?, ?, ?, ?, ?) "
+               "ON CONFLICT(id) DO UPDATE SET status = excluded.status, version = excluded.version, "
+               "state = excluded.state")
+        params = (job.id, RUN_ID, job.status, job.version, job.created_at, json.dumps(job.to_dict(), default=str))
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.storage.pool.connection() as conn:
+            conn.execute(sql, params)
+
+    def _drain_progress(self):
+        """Aplica las actualizaciones de progreso que llegan de los procesos hijos"""
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            job_id, update = message
+            job = self.jobs.get(job_id)
+            # Los mensajes que llegan después del resultado final se descartan
+            if job is None or job.status in FINISHED_STATES:
+                continue
+            job.update(**update)
+            try:
+                _retry_locked(self._save, job, attempts=PROGRESS_SAVE_ATTEMPTS)
+            except Exception as e:
+                # El estado en memoria ya tiene el cambio: se guardará con el siguiente.
+                # Este hilo no debe morir o ningún trabajo volvería a avanzar
+                print(f"⚠️ No se pudo guardar el progreso del trabajo {job_id}: {e}")
+
+    def submit(self, filename, path, digest, size_bytes):
+        """Encola un archivo ya volcado a disco y devuelve el estado del trabajo creado"""
+        job = Job(filename, path, digest, size_bytes)
+        # BEGIN IMMEDIATE: contar y dar de alta es atómico entre todos los workers
+        with self.storage.transaction() as conn:
+            pending = conn.execute(
+                f"SELECT COUNT(*) FROM ingest_jobs WHERE status NOT IN ({', '.join('?' for _ in FINISHED_STATES)})",
+                FINISHED_STATES,
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Hay {self.max_pending} trabajos pendientes; inténtalo más tarde")
+            self._save(job, conn)
+            self._trim_finished(conn)
+        self.jobs[job.id] = job
+        future = self._pool.submit(_run_ingest_job, job.id, str(path), digest, self.chunk_rows, filename)
+        future.add_done_callback(lambda done: self._finish(job, done))
+        return job.to_dict()
+
+    def _finish(self, job, future):
+        """
+        Cierra el trabajo con el resultado (o el error) del proceso hijo. El
+        estado final se guarda siempre: un trabajo que se quedara en 'running'
+        contaría para max_pending para siempre.
+        """
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                final = {'status': 'error', 'stage': 'error', 'error': str(e)}
+            else:
+                final = {'status': 'done', 'stage': 'done', 'rows': result['rows'], 'result': result}
+                changed = result.get('changed', [])
+                # La caché de resultados y el canal de cambios se avisan desde el servidor, no desde el hijo
+                try:
+                    _retry_locked(get_result_cache().invalidate, changed)
+                    _retry_locked(publish_changes, changed)
+                except Exception as e:
+                    print(f"⚠️ No se pudo avisar del cambio del trabajo {job.id}: {e}")
+            job.update(**final, finished_at=time.time())
+            _retry_locked(self._save, job)
+        except Exception as e:
+            print(f"❌ No se pudo guardar el resultado del trabajo {job.id}: {e}")
+        finally:
+            self.jobs.pop(job.id, None)
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def _trim_finished(self, conn):
+        conn.execute(
+            f"DELETE FROM ingest_jobs WHERE id IN (SELECT id FROM ingest_jobs "
+            f"WHERE status IN ({', '.join('?' for _ in FINISHED_STATES)}) ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*FINISHED_STATES, MAX_FINISHED_JOBS),
+        )
+
+    def get(self, job_id):
+        """Estado del trabajo (de cualquier worker) o None"""
+        row = self.storage.query("SELECT state FROM ingest_jobs WHERE id = ?", (job_id,))
+        return json.loads(row[0]['state']) if row else None
+
+    def version(self, job_id):
+        row = self.storage.query("SELECT version FROM ingest_jobs WHERE id = ?", (job_id,))
+        return row[0]['version'] if row else None
+
+    def list_jobs(self):
+        rows = self.storage.query("SELECT state FROM ingest_jobs ORDER BY created_at DESC")
+        return [json.loads(row['state']) for row in rows]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._queue.put(None)
+
+
+async def iter_job_events(manager, job_id, request, interval=0.25):
+    """
+    Genera eventos Server-Sent Events con el estado del trabajo.
+    Emite 'progress' en cada cambio y termina con 'done' o 'error'.
+    """
+    version = -1
+    while not await request.is_disconnected():
+        # Las consultas a SQLite van en un hilo para no bloquear el event loop
+        current = await asyncio.to_thread(manager.version, job_id)
+        if current is None:
+            return
+        if current != version:
+            version = current
+            state = await asyncio.to_thread(manager.get, job_id)
+            event = state['status'] if state['status'] in FINISHED_STATES else 'progress'
+            yield f"event: {event}\ndata: {json.dumps(state, default=str)}\n\n"
+            if state['status'] in FINISHED_STATES:
+                return
+        await asyncio.sleep(interval)
+
+
+def get_job_manager():
+    """Devuelve el gestor de trabajos configurado (backend.jobs.*)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                max_workers=int(get_setting('backend.jobs.max_workers', max(1, (os.cpu_count() or 2) // 2))),
+                max_pending=int(get_setting('backend.jobs.max_pending', 20)),
+                chunk_rows=int(get_setting('backend.ingestion.chunk_rows', 5000)),
+            )
+    return _manager
+
+
+def shutdown_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
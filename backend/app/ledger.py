@@ -0,0 +1,204 @@
+"""
+Libro de saldos incremental
+Cada movimiento de la tabla `balances` (cargos positivos, pagos negativos) se
+aplica una sola vez, en orden de id, sobre tres estructuras materializadas:
+
+- account_balances: saldo acumulado por cliente (una actualización por movimiento)
+- open_items: partidas abiertas; los pagos cancelan primero las más antiguas (FIFO)
+- ledger_snapshots: foto de todos los saldos cada `snapshot_every` movimientos
+
+Los saldos y la antigüedad (aging.py) se leen de estas tablas sin recorrer el histórico,
+y el saldo en cualquier punto del libro se reconstruye desde la foto más
+cercana más los pocos movimientos posteriores.
+"""
+import time
+
+try:
+    from .aging import compute_aging, to_day_array
+    from .settings import get_setting
+    from .storage import bump_data_versions
+except ImportError:
+    from aging import compute_aging, to_day_array
+    from settings import get_setting
+    from storage import bump_data_versions
+
+DEFAULT_SNAPSHOT_EVERY = 10000
+APPLY_BATCH_ROWS = 5000
+
+
+def _ledger_state(conn):
+    row = conn.execute("SELECT last_movement_id, since_snapshot FROM ledger_state WHERE id = 1").fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def _settle(conn, movement_id, customer_code, due_date, amount_cents):
+    """
+    Compensa el movimiento con las partidas abiertas de signo contrario, de la
+    más antigua a la más reciente; lo que sobra queda como partida abierta.
+    Cada vuelta cierra una partida, así que el coste amortizado es O(1).
+    """
+    remaining = amount_cents
+    while remaining:
+        item = conn.execute(
+            "SELECT movement_id, open_cents FROM open_items WHERE customer_code = ? "
+            "ORDER BY due_date, movement_id LIMIT 1",
+            (customer_code,),
+        ).fetchone()
+        # Todas las partidas abiertas de un cliente tienen el mismo signo
+        if item is None or (item[1] > 0) == (remaining > 0):
+            conn.execute(
+                "INSERT INTO open_items (movement_id, customer_code, due_date, open_cents) VALUES (?, ?, ?, ?)",
+                (movement_id, customer_code, due_date, remaining),
+            )
+            return
+        open_id, open_cents = item
+        if abs(open_cents) <= abs(remaining):
+            conn.execute("DELETE FROM open_items WHERE movement_id = ?", (open_id,))
+            remaining += open_cents
+        else:
+            conn.execute("UPDATE open_items SET open_cents = open_cents + ? WHERE movement_id = ?",
+                         (remaining, open_id))
+            remaining = 0
+
+
+def take_snapshot(conn, last_movement_id):
+    """Guarda el saldo de todas las cuentas en la posición actual del libro"""
+    snapshot_id = conn.execute(
+        "INSERT INTO ledger_snapshots (last_movement_id, created_at) VALUES (?, ?)",
+        (last_movement_id, time.time()),
+    ).lastrowid
+    conn.execute(
+        "INSERT INTO ledger_snapshot_balances (snapshot_id, customer_code, balance_cents) "
+        "SELECT ?, customer_code, balance_cents FROM account_balances",
+        (snapshot_id,),
+    )
+    return snapshot_id
+
+
+def apply_pending_movements(conn, snapshot_every=None):
+    """
+    Aplica al libro los movimientos con id mayor que el último aplicado.
+    Debe llamarse dentro de una transacción de escritura. Devuelve cuántos aplicó.
+    """
+    snapshot_every = snapshot_every or int(get_setting('backend.ledger.snapshot_every', DEFAULT_SNAPSHOT_EVERY))
+    last_id, since_snapshot = _ledger_state(conn)
+    cursor = conn.execute(
+        "SELECT id, customer_code, entry_date, due_date, amount_cents FROM balances WHERE id > ? ORDER BY id",
+        (last_id,),
+    )
+    applied = 0
+    now = time.time()
+    while True:
+        movements = cursor.fetchmany(APPLY_BATCH_ROWS)
+        if not movements:
+            break
+        for movement_id, customer_code, entry_date, due_date, amount_cents in movements:
+            conn.execute(
+                "INSERT INTO account_balances (customer_code, balance_cents, movements, last_movement_id, updated_at) "
+                "VALUES (?, ?, 1, ?, ?) ON CONFLICT(customer_code) DO UPDATE SET "
+                "balance_cents = balance_cents + excluded.balance_cents, movements = movements + 1, "
+                "last_movement_id = excluded.last_movement_id, updated_at = excluded.updated_at",
+                (customer_code, amount_cents, movement_id, now),
+            )
+            _settle(conn, movement_id, customer_code, due_date or entry_date, amount_cents)
+            last_id = movement_id
+            since_snapshot += 1
+            applied += 1
+            if since_snapshot >= snapshot_every:
+                take_snapshot(conn, last_id)
+                since_snapshot = 0
+    if applied:
+        conn.execute(
+            "INSERT INTO ledger_state (id, last_movement_id, since_snapshot) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_movement_id = excluded.last_movement_id, "
+            "since_snapshot = excluded.since_snapshot",
+            (last_id, since_snapshot),
+        )
+        bump_data_versions(conn, ['account_balances'])
+    return applied
+
+
+def sync_ledger(storage):
+    """Pone el libro al día si hay movimientos sin aplicar (p. ej. cargados antes de existir el libro)"""
+    with storage.pool.connection() as conn:
+        last_id, _ = _ledger_state(conn)
+        pending = conn.execute("SELECT 1 FROM balances WHERE id > ? LIMIT 1", (last_id,)).fetchone()
+    if pending is None:
+        return 0
+    with storage.transaction() as conn:
+        return apply_pending_movements(conn)
+
+
+def open_items_arrays(storage):
+    """Partidas abiertas como arrays (clientes, vencimientos, centavos) para el motor de antigüedad"""
+    # numpy se importa al usarlo: el servidor arranca sin cargarlo
+    import numpy as np
+
+    with storage.pool.connection() as conn:
+        rows = conn.execute("SELECT customer_code, due_date, open_cents FROM open_items").fetchall()
+    if not rows:
+        return np.array([], dtype=object), np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64)
+    codes, due_dates, cents = zip(*rows)
+    return np.array(codes, dtype=object), to_day_array(due_dates), np.array(cents, dtype=np.int64)
+
+
+def ledger_aging(storage, as_of=None):
+    """Antigüedad de toda la cartera a la fecha `as_of`, en una pasada vectorizada"""
+    return compute_aging(*open_items_arrays(storage), as_of=as_of)
+
+
+def ledger_summary(storage):
+    """Posición del libro, número de cuentas y fotos"""
+    with storage.pool.connection() as conn:
+        last_id, since_snapshot = _ledger_state(conn)
+        accounts, balance = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(balance_cents), 0) FROM account_balances").fetchone()
+        snapshots = conn.execute("SELECT COUNT(*) FROM ledger_snapshots").fetchone()[0]
+    return {
+        'last_movement_id': last_id,
+        'since_snapshot': since_snapshot,
+        'snapshots': snapshots,
+        'accounts': accounts,
+        'balance_cents': balance,
+    }
+
+
+def balances_at(storage, movement_id, customer_code=None):
+    """
+    Saldos tal como estaban tras aplicar el movimiento `movement_id`: parte de
+    la foto más cercana anterior y repite solo los movimientos posteriores.
+    """
+    with storage.pool.connection() as conn:
+        snapshot = conn.execute(
+            "SELECT id, last_movement_id FROM ledger_snapshots WHERE last_movement_id <= ? "
+            "ORDER BY last_movement_id DESC LIMIT 1",
+            (movement_id,),
+        ).fetchone()
+        snapshot_id, base_id = snapshot if snapshot else (None, 0)
+        customer_filter = " AND customer_code = ?" if customer_code is not None else ""
+        extra = (customer_code,) if customer_code is not None else ()
+
+        balances = {}
+        if snapshot_id is not None:
+            rows = conn.execute(
+                "SELECT customer_code, balance_cents FROM ledger_snapshot_balances WHERE snapshot_id = ?"
+                + customer_filter,
+                (snapshot_id, *extra),
+            )
+            balances = {code: cents for code, cents in rows}
+        replayed = 0
+        rows = conn.execute(
+            "SELECT customer_code, SUM(amount_cents), COUNT(*) FROM balances WHERE id > ? AND id <= ?"
+            + customer_filter + " GROUP BY customer_code",
+            (base_id, movement_id, *extra),
+        )
+        for code, cents, count in rows:
+            balances[code] = balances.get(code, 0) + cents
+            replayed += count
+    return {
+        'movement_id': movement_id,
+        'snapshot_id': snapshot_id,
+        'snapshot_movement_id': base_id,
+        'replayed': replayed,
+        'balances': balances,
+    }
@@ -1,11 +1,416 @@
-from fastapi import FastAPI
+import os
+import time
+from datetime import date
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+
+try:
+    from .cache import get_workbook_cache
+    from .changes import TOPICS, TooManySubscribers, get_change_feed, publish_changes
+    from .coalesce import coalesce, single_flight_stats
+    from .cube import DIMENSIONS, CubeQueryError, get_sales_cube, rebuild_from_storage
+    from .downsample import DownsampleError, downsample_rows
+    from .export import XLSX_MEDIA_TYPE, ExportError, iter_xlsx_export
+    from .ingestion import IngestionError, StageTimer, ingest_cached, spool_upload
+    from .jobs import JobQueueFull, get_job_manager, iter_job_events, shutdown_job_manager
+    from .ledger import balances_at, ledger_aging, ledger_summary, sync_ledger
+    from .pagination import PaginationError, keyset_page, parse_fields
+    from .reports import REPORT_LAYOUTS, ReportError, get_report_renderer, shutdown_report_renderer
+    from .responses import FastJSONResponse, etag_headers, etag_matches, make_etag, not_modified
+    from .result_cache import get_result_cache, month_tags, normalize_key
+    from .settings import get_data_dir, get_setting
+    from .storage import TABLES, StorageBusy, get_storage
+except ImportError:
+    from cache import get_workbook_cache
+    from changes import TOPICS, TooManySubscribers, get_change_feed, publish_changes
+    from coalesce import coalesce, single_flight_stats
+    from cube import DIMENSIONS, CubeQueryError, get_sales_cube, rebuild_from_storage
+    from downsample import DownsampleError, downsample_rows
+    from export import XLSX_MEDIA_TYPE, ExportError, iter_xlsx_export
+    from ingestion import IngestionError, StageTimer, ingest_cached, spool_upload
+    from jobs import JobQueueFull, get_job_manager, iter_job_events, shutdown_job_manager
+    from ledger import balances_at, ledger_aging, ledger_summary, sync_ledger
+    from pagination import PaginationError, keyset_page, parse_fields
+    from reports import REPORT_LAYOUTS, ReportError, get_report_renderer, shutdown_report_renderer
+    from responses import FastJSONResponse, etag_headers, etag_matches, make_etag, not_modified
+    from result_cache import get_result_cache, month_tags, normalize_key
+    from settings import get_data_dir, get_setting
+    from storage import TABLES, StorageBusy, get_storage
 
 app = FastAPI()
+# Segundos que se piden al cliente antes de reintentar si SQLite está ocupado
+BUSY_RETRY_SECONDS = 5
+
+def _storage_busy(error):
+    return HTTPException(status_code=503, detail=str(error),
+                         headers={"Retry-After": str(BUSY_RETRY_SECONDS)})
+
+@app.on_event("shutdown")
+def shutdown_background_workers():
+    shutdown_job_manager()
+    shutdown_report_renderer()
 
 @app.get("/")
 def read_root():
     return {"Hello": "World!!!"}
 
-@app.get("/items")
-def read_item():
-    return { "values": [{ "id": 1, "value": "item1" }, { "id": 2, "value": "item2" }] }
\ No newline at end of file
+ITEM_FIELDS = ("id", "sku", "name", "category", "price_cents", "stock")
+ITEM_SORTABLE = ("id", "sku", "name", "category", "price_cents")
+
+@app.get("/items", response_class=FastJSONResponse)
+def read_item(
+    limit: int = 100,
+    cursor: str = None,
+    sort: str = "sku",
+    fields: str = None,
+    category: str = None,
+    sku_prefix: str = None,
+    min_price_cents: int = None,
+    max_price_cents: int = None,
+    in_stock: bool = None,
+    request: Request = None,
+):
+    """Inventario paginado por cursor, con campos seleccionables, orden y filtros indexados"""
+    storage = get_storage()
+    etag = make_etag(request, storage.data_versions("inventory")["inventory"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    where = []
+    if category is not None:
+        where.append(("category = ?", [category]))
+    if sku_prefix:
+        where.append(("sku >= ? AND sku < ?", [sku_prefix, sku_prefix + "\U0010ffff"]))
+    if min_price_cents is not None:
+        where.append(("price_cents >= ?", [min_price_cents]))
+    if max_price_cents is not None:
+        where.append(("price_cents <= ?", [max_price_cents]))
+    if in_stock is not None:
+        where.append(("stock > 0" if in_stock else "COALESCE(stock, 0) <= 0", []))
+    try:
+        page = keyset_page(
+            storage, "inventory",
+            columns=parse_fields(fields, ITEM_FIELDS),
+            sort=sort, cursor=cursor, limit=limit, where=where, sortable=ITEM_SORTABLE,
+        )
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({**page, "limit": limit, "sort": sort}, headers=etag_headers(etag))
+
+def _invalidate_results(changed):
+    get_result_cache().invalidate(changed)
+
+@app.post("/test")
+async def ingest_test_file(
+    file: UploadFile = File(...),
+    timestamp: str = Form(None),
+    source: str = Form(None),
+):
+    """Recibe un Excel/CSV, lo vuelca a disco y lo recorre por lotes (o lo sirve desde la caché)"""
+    started = time.perf_counter()
+    timer = StageTimer()
+    try:
+        with timer.stage('spool'):
+            path, size, digest = await spool_upload(file, get_data_dir("spool"))
+    except IngestionError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    try:
+        chunk_rows = int(get_setting('backend.ingestion.chunk_rows', 5000))
+        result = await run_in_threadpool(ingest_cached, path, digest, chunk_rows, timer, file.filename)
+    except IngestionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except StorageBusy as e:
+        raise _storage_busy(e)
+    finally:
+        os.remove(path)
+
+    # invalidar escribe en SQLite (cache_generations): fuera del event loop
+    try:
+        await run_in_threadpool(_invalidate_results, result['changed'])
+    except StorageBusy as e:
+        raise _storage_busy(e)
+    await run_in_threadpool(publish_changes, result['changed'])
+    result['timings']['total'] = round(time.perf_counter() - started, 6)
+    return {
+        **result,
+        "filename": file.filename,
+        "size_bytes": size,
+        "source": source,
+        "timestamp": timestamp,
+    }
+
+@app.get("/cache")
+def read_cache():
+    """Estado de la caché columnar de libros subidos"""
+    return get_workbook_cache().stats()
+
+@app.delete("/cache")
+def purge_cache():
+    """Vacía la caché columnar"""
+    return {"removed": get_workbook_cache().purge()}
+
+@app.delete("/cache/{digest}")
+def purge_cache_entry(digest: str):
+    """Elimina una entrada de la caché por su hash"""
+    try:
+        removed = get_workbook_cache().purge(digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="Entrada no encontrada en la caché")
+    return {"removed": removed}
+
+@app.get("/report-cache")
+def read_report_cache():
+    """Estado de la caché de resultados de reportes y de las peticiones agrupadas"""
+    return {**get_result_cache().stats(), "single_flight": single_flight_stats()}
+
+@app.delete("/report-cache")
+def clear_report_cache():
+    """Vacía la caché de resultados de reportes (en todos los workers)"""
+    try:
+        return {"removed": get_result_cache().clear()}
+    except StorageBusy as e:
+        raise _storage_busy(e)
+
+def _submit_job(filename, path, digest, size):
+    return get_job_manager().submit(filename, path, digest, size)
+
+@app.post("/jobs", status_code=202)
+async def submit_ingest_job(file: UploadFile = File(...)):
+    """Encola la ingesta de un Excel/CSV y devuelve el id del trabajo sin esperar al resultado"""
+    try:
+        path, size, digest = await spool_upload(file, get_data_dir("spool"))
+    except IngestionError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        # Crear el gestor y dar de alta el trabajo abren transacciones de escritura
+        # (BEGIN IMMEDIATE) que esperan al bloqueo de SQLite: fuera del event loop
+        job = await run_in_threadpool(_submit_job, file.filename, path, digest, size)
+    except JobQueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=429, detail=str(e))
+    except StorageBusy as e:
+        os.remove(path)
+        raise _storage_busy(e)
+    return {
+        **job,
+        "status_url": f"/jobs/{job['id']}",
+        "events_url": f"/jobs/{job['id']}/events",
+    }
+
+@app.get("/jobs", response_class=FastJSONResponse)
+def list_ingest_jobs():
+    return FastJSONResponse({"jobs": get_job_manager().list_jobs()})
+
+def _get_job_or_404(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@app.get("/jobs/{job_id}")
+def read_ingest_job(job_id: str):
+    return _get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_ingest_job(job_id: str, request: Request):
+    """Progreso del trabajo como Server-Sent Events"""
+    await run_in_threadpool(_get_job_or_404, job_id)
+    return StreamingResponse(
+        iter_job_events(get_job_manager(), job_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/events")
+async def stream_changes(request: Request, topics: str = None):
+    """Cambios de ventas, inventario, clientes y saldos en vivo (Server-Sent Events)"""
+    topics = _split_values(topics) or list(TOPICS)
+    unknown = [topic for topic in topics if topic not in TOPICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Temas desconocidos: {', '.join(unknown)}. Opciones: {', '.join(TOPICS)}")
+    # EventSource reenvía el último id recibido al reconectar: se reanuda desde ahí
+    last_event_id = request.headers.get("last-event-id")
+    try:
+        events = await get_change_feed().stream(
+            request, topics, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/events/stats")
+def read_change_feed():
+    """Estado del canal de cambios: secuencia, búfer y suscriptores"""
+    return get_change_feed().stats()
+
+@app.get("/storage")
+def read_storage_stats(request: Request):
+    """Número de filas por tabla del almacenamiento SQLite"""
+    storage = get_storage()
+    etag = make_etag(request, *storage.data_versions(*TABLES).values())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return FastJSONResponse({"tables": storage.counts()}, headers=etag_headers(etag))
+
+def _split_values(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+@app.get("/sales/indicator", response_class=FastJSONResponse)
+@coalesce
+def read_sales_indicator(
+    grain: str = "month",
+    by: str = None,
+    sku: str = None,
+    customer_code: str = None,
+    store: str = None,
+    start: str = None,
+    end: str = None,
+    max_points: int = None,
+    downsample: str = "lttb",
+    request: Request = None,
+):
+    """
+    Indicador de Ventas: agregados del cubo por periodo y dimensiones (filtros separados por comas).
+    Con max_points la serie se reduce en el servidor (lttb o minmax) a unos max_points puntos.
+    """
+    # Las respuestas salen del cubo: su versión sube con cada lote fusionado
+    etag = make_etag(request, get_sales_cube().manifest()["version"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    filters = {"sku": _split_values(sku), "customer_code": _split_values(customer_code),
+               "store": _split_values(store)}
+    key = normalize_key("sales_indicator", {"grain": grain, "by": _split_values(by), **filters,
+                                            "start": start, "end": end, "max_points": max_points,
+                                            "downsample": downsample if max_points else None})
+
+    def compute():
+        result = get_sales_cube().query(grain, _split_values(by), filters, start, end)
+        if max_points:
+            total = len(result["values"])
+            result["values"] = downsample_rows(result["values"], max_points,
+                                               group_by=[dim for dim in DIMENSIONS if dim in _split_values(by)],
+                                               method=downsample)
+            result["downsampled"] = {"method": downsample, "points": len(result["values"]), "total": total}
+        return result
+
+    try:
+        return FastJSONResponse(get_result_cache().get_or_compute(key, month_tags("sales", start, end), compute),
+                                headers=etag_headers(etag))
+    except (CubeQueryError, DownsampleError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/sales/cube")
+def read_sales_cube():
+    """Cuboides materializados y su tamaño"""
+    return get_sales_cube().stats()
+
+@app.post("/sales/cube/rebuild")
+def rebuild_sales_cube():
+    """Reconstruye el cubo desde la tabla de ventas"""
+    rows = rebuild_from_storage(get_sales_cube(), get_storage())
+    get_result_cache().invalidate(["sales"])
+    publish_changes(["sales"])
+    return {"rows": rows, **get_sales_cube().stats()}
+
+BALANCE_FIELDS = ("customer_code", "balance_cents", "movements", "last_movement_id")
+BALANCE_SORTABLE = ("id", "customer_code", "balance_cents")
+
+@app.get("/balances", response_class=FastJSONResponse)
+@coalesce
+def read_balances(
+    limit: int = 100,
+    cursor: str = None,
+    sort: str = "-balance_cents",
+    as_of: str = None,
+    min_balance_cents: int = None,
+    request: Request = None,
+):
+    """Saldos actuales por cliente con su antigüedad (0-30, 31-60, 61-90, 90+ días), desde el libro"""
+    storage = get_storage()
+    if sync_ledger(storage):
+        get_result_cache().invalidate(["balances"])
+    as_of = as_of or date.today().isoformat()
+    # La antigüedad depende del día de corte: sin as_of la etiqueta cambia cada día
+    etag = make_etag(request, storage.data_versions("account_balances")["account_balances"], as_of)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    where = []
+    if min_balance_cents is not None:
+        where.append(("balance_cents >= ?", [min_balance_cents]))
+
+    def compute():
+        page = keyset_page(storage, "account_balances", columns=BALANCE_FIELDS, sort=sort,
+                           cursor=cursor, limit=limit, where=where, sortable=BALANCE_SORTABLE)
+        aging = ledger_aging(storage, as_of)
+        page_aging = aging.by_customer([row["customer_code"] for row in page["values"]])
+        empty = {"buckets": {}, "credit_cents": 0}
+        for row in page["values"]:
+            row.update(page_aging.get(row["customer_code"], empty))
+        return {
+            **page,
+            "as_of": as_of,
+            "aging": aging.totals(),
+            "ledger": ledger_summary(storage),
+        }
+
+    key = normalize_key("balances", {"limit": limit, "cursor": cursor, "sort": sort, "as_of": as_of,
+                                     "min_balance_cents": min_balance_cents})
+    try:
+        date.fromisoformat(as_of)
+        return FastJSONResponse(get_result_cache().get_or_compute(key, ["balances"], compute),
+                                headers=etag_headers(etag))
+    except (PaginationError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/balances/history", response_class=FastJSONResponse)
+def read_balances_history(request: Request, movement_id: int, customer_code: str = None):
+    """Saldos en una posición del libro, reconstruidos desde la foto más cercana"""
+    storage = get_storage()
+    etag = make_etag(request, *storage.data_versions("balances", "account_balances").values())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return FastJSONResponse(balances_at(storage, movement_id, customer_code), headers=etag_headers(etag))
+
+@app.get("/reports")
+def list_reports():
+    """Reportes disponibles, sus parámetros y el estado de la caché de PDFs"""
+    return {
+        "reports": {name: {"title": layout["title"], "params": list(layout["params"])}
+                    for name, layout in REPORT_LAYOUTS.items()},
+        **get_report_renderer().stats(),
+    }
+
+@app.get("/reports/{report_type}.pdf")
+async def download_report(report_type: str, request: Request):
+    """Genera (o sirve desde la caché) un reporte PDF; los parámetros van en la query"""
+    renderer = get_report_renderer()
+    try:
+        path, cached = await renderer.get_report(report_type, dict(request.query_params))
+    except (ReportError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FileResponse(
+        str(path),
+        media_type="application/pdf",
+        filename=f"{report_type}.pdf",
+        headers={"X-Report-Cache": "hit" if cached else "miss"},
+    )
+
+@app.get("/export/{table}.xlsx")
+def export_table(table: str, request: Request):
+    """Exporta ventas, inventario, clientes o saldos a Excel por streaming (filtros en la query)"""
+    try:
+        chunks = iter_xlsx_export(get_storage(), table, dict(request.query_params))
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{table}.xlsx"'},
+    )
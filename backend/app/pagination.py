@@ -0,0 +1,128 @@
+"""
+Paginación por cursor (keyset) sobre tablas SQLite
+En lugar de OFFSET, cada página continúa desde la última fila devuelta
+(valor de la columna de orden + id), así que la página 1000 cuesta lo mismo
+que la primera: SQLite entra al índice directamente en esa posición.
+"""
+import base64
+import json
+
+MAX_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    """Parámetros de paginación, orden o campos inválidos"""
+
+
+def encode_cursor(sort, value, row_id):
+    payload = json.dumps({'s': sort, 'v': value, 'id': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Devuelve (valor, id) del cursor; falla si el cursor es de otro orden"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value, row_id = payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise PaginationError("Cursor inválido") from e
+    if payload.get('s') != sort:
+        raise PaginationError("El cursor pertenece a otro orden; vuelve a pedir la primera página")
+    return value, row_id
+
+
+def parse_sort(sort, sortable):
+    """'-price_cents' -> ('price_cents', True). Solo se permiten columnas indexadas"""
+    descending = sort.startswith('-')
+    column = sort.lstrip('-+')
+    if column not in sortable:
+        raise PaginationError(f"No se puede ordenar por '{column}'. Opciones: {', '.join(sortable)}")
+    return column, descending
+
+
+def parse_fields(fields, allowed):
+    """'sku,name' -> ['sku', 'name']; None devuelve todos los campos permitidos"""
+    if not fields:
+        return list(allowed)
+    selected = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise PaginationError(f"Campos desconocidos: {', '.join(unknown)}")
+    return selected
+
+
+def _segments(column, descending):
+    """
+    SQLite ordena los NULL primero en ASC y al final en DESC. Para que cada
+    consulta sea un rango sobre el índice, la tabla se recorre en dos tramos
+    (filas con NULL y filas con valor) en ese mismo orden.
+    """
+    direction = 'DESC' if descending else 'ASC'
+    nulls = ('null', f"{column} IS NULL", f"id {direction}")
+    values = ('value', f"{column} IS NOT NULL", f"{column} {direction}, id {direction}")
+    if column == 'id':
+        return [values]
+    return [values, nulls] if descending else [nulls, values]
+
+
+def _after_condition(segment, column, descending, value, row_id):
+    """Condición 'después de (value, id)' dentro de un tramo"""
+    operator = '<' if descending else '>'
+    if segment == 'null':
+        return f"id {operator} ?", [row_id]
+    return f"({column}, id) {operator} (?, ?)", [value, row_id]
+
+
+def keyset_page(storage, table, columns, sort='id', cursor=None, limit=100, where=None, sortable=('id',)):
+    """
+    Devuelve una página de `table`.
+
+    Args:
+        storage: Instancia de storage.Storage
+        table: Tabla a consultar
+        columns: Columnas a devolver
+        sort: Columna de orden (prefijo '-' para descendente)
+        cursor: Cursor opaco devuelto por la página anterior
+        limit: Filas por página (1..MAX_LIMIT)
+        where: Lista de (condición SQL con '?', [parámetros]) combinadas con AND
+        sortable: Columnas por las que se permite ordenar (deben estar indexadas)
+
+    Returns:
+        Dict con 'values' y 'next_cursor' (None en la última página)
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise PaginationError(f"limit debe estar entre 1 y {MAX_LIMIT}")
+    column, descending = parse_sort(sort, sortable)
+    segments = _segments(column, descending)
+    position = None
+    first_segment = 0
+    if cursor:
+        position = decode_cursor(cursor, sort)
+        current = 'null' if position[0] is None else 'value'
+        first_segment = [name for name, _, _ in segments].index(current) if column != 'id' else 0
+
+    select = ', '.join(dict.fromkeys(list(columns) + [column, 'id']))
+    rows = []
+    for index in range(first_segment, len(segments)):
+        name, segment_condition, order_by = segments[index]
+        conditions = list(where or []) + [(segment_condition, [])]
+        if position is not None and index == first_segment:
+            conditions.append(_after_condition(name, column, descending, *position))
+        sql = f"SELECT {select} FROM {table} WHERE " + " AND ".join(c for c, _ in conditions)
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params = [p for _, condition_params in conditions for p in condition_params]
+        # Se pide una fila de más para saber si hay página siguiente
+        rows.extend(storage.query(sql, params + [limit + 1 - len(rows)]))
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last[column], last['id'])
+    return {
+        'values': [{key: row[key] for key in columns} for row in rows],
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,394 @@
+"""
+Generación de reportes PDF con fpdf2 en un pool de procesos
+Maquetar un PDF tabular grande es trabajo de CPU; hacerlo en el event loop
+bloquearía el resto de peticiones. Cada reporte se renderiza en un proceso
+del pool, que escribe el PDF directamente en un archivo de la caché de
+artefactos (<data_dir>/reports); el servidor solo lo sirve con FileResponse.
+
+Cada proceso guarda en memoria la ruta resuelta de la fuente y las
+plantillas (anchos de columna ya calculados), así solo el primer reporte
+paga ese coste.
+
+Las filas se leen por lotes, pero fpdf2 no puede volcar páginas a disco a
+medida que se completan: el documento entero se mantiene en memoria del
+proceso del pool hasta escribirlo al final. Son unos 25 KB por página de
+50 filas (unos 50 MB para 100.000 filas), y solo en ese proceso.
+Los mismos parámetros sobre los mismos datos devuelven el PDF ya generado.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+try:
+    from .cube import get_sales_cube
+    from .ledger import ledger_aging
+    from .settings import get_data_dir, get_setting
+    from .storage import get_storage
+except ImportError:
+    from cube import get_sales_cube
+    from ledger import ledger_aging
+    from settings import get_data_dir, get_setting
+    from storage import get_storage
+
+FETCH_ROWS = 2000
+CORE_FONT = 'helvetica'
+_renderer = None
+_renderer_lock = threading.Lock()
+
+# Cachés de cada proceso del pool
+_font_cache = {}
+_template_cache = {}
+_report_pdf = None
+
+# Columnas de cada reporte: (clave, título, ancho relativo, alineación, formato)
+REPORT_LAYOUTS = {
+    'inventory': {
+        'title': 'Inventario',
+        'orientation': 'P',
+        'columns': [
+            ('sku', 'SKU', 2, 'L', None),
+            ('name', 'Nombre', 5, 'L', None),
+            ('category', 'Categoría', 3, 'L', None),
+            ('price_cents', 'Precio', 2, 'R', 'money'),
+            ('stock', 'Stock', 1.5, 'R', 'int'),
+        ],
+        'params': ('category',),
+    },
+    'sales': {
+        'title': 'Ventas',
+        'orientation': 'L',
+        'columns': [
+            ('period', 'Periodo', 2, 'L', None),
+            ('sku', 'Producto', 2.5, 'L', None),
+            ('customer_code', 'Cliente', 2.5, 'L', None),
+            ('store', 'Tienda', 2, 'L', None),
+            ('quantity', 'Unidades', 1.5, 'R', 'int'),
+            ('lines', 'Líneas', 1.5, 'R', 'int'),
+            ('amount_cents', 'Total', 2.5, 'R', 'money'),
+        ],
+        'params': ('grain', 'by', 'start', 'end', 'sku', 'customer_code', 'store'),
+    },
+    'balances': {
+        'title': 'Saldos y antigüedad de cartera',
+        'orientation': 'L',
+        'columns': [
+            ('customer_code', 'Cliente', 2.5, 'L', None),
+            ('balance_cents', 'Saldo', 2.5, 'R', 'money'),
+            ('0_30', '0-30', 2, 'R', 'money'),
+            ('31_60', '31-60', 2, 'R', 'money'),
+            ('61_90', '61-90', 2, 'R', 'money'),
+            ('90_plus', '+90', 2, 'R', 'money'),
+            ('credit_cents', 'A favor', 2, 'R', 'money'),
+        ],
+        'params': ('as_of', 'min_balance_cents'),
+    },
+}
+# Tablas (data_versions) que lee cada reporte; las ventas salen del cubo
+REPORT_TABLES = {
+    'inventory': ('inventory',),
+    'sales': ('sales', 'cube'),
+    'balances': ('balances', 'account_balances'),
+}
+
+
+class ReportError(ValueError):
+    """Tipo de reporte o parámetros inválidos"""
+
+
+def normalize_params(report_type, params):
+    """
+    Valida los parámetros del reporte y los devuelve ordenados y sin vacíos.
+    Sin as_of se usa el día de hoy: la antigüedad depende del día de corte y
+    el PDF de ayer no vale hoy.
+    """
+    layout = REPORT_LAYOUTS.get(report_type)
+    if layout is None:
+        raise ReportError(f"Reporte desconocido '{report_type}'. Opciones: {', '.join(REPORT_LAYOUTS)}")
+    unknown = [key for key in params if key not in layout['params']]
+    if unknown:
+        raise ReportError(f"Parámetros no válidos para '{report_type}': {', '.join(unknown)}")
+    params = {key: str(value).strip() for key, value in params.items()
+              if value is not None and str(value).strip()}
+    if 'as_of' in layout['params']:
+        params.setdefault('as_of', date.today().isoformat())
+        try:
+            date.fromisoformat(params['as_of'])
+        except ValueError:
+            raise ReportError(f"Fecha de corte inválida '{params['as_of']}' (AAAA-MM-DD)")
+    return dict(sorted(params.items()))
+
+
+def _format_value(value, kind):
+    if value is None:
+        return ''
+    if kind == 'money':
+        return f"{value / 100:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    if kind == 'int':
+        return f"{int(value):,}".replace(',', '.')
+    return str(value)
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+def _iter_report_rows(report_type, params):
+    """Filas del reporte como dicts, leídas por lotes del almacenamiento o del cubo"""
+    storage = get_storage()
+    if report_type == 'inventory':
+        sql = "SELECT sku, name, category, price_cents, stock FROM inventory"
+        args = ()
+        if params.get('category'):
+            sql += " WHERE category = ?"
+            args = (params['category'],)
+        with storage.pool.connection() as conn:
+            cursor = conn.execute(sql + " ORDER BY sku", args)
+            while True:
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    return
+                yield from (dict(row) for row in rows)
+    elif report_type == 'sales':
+        filters = {dim: _split(params.get(dim)) for dim in ('sku', 'customer_code', 'store')}
+        result = get_sales_cube().query(params.get('grain', 'month'), _split(params.get('by')), filters,
+                                        params.get('start'), params.get('end'))
+        yield from result['values']
+    elif report_type == 'balances':
+        aging = ledger_aging(storage, params.get('as_of'))
+        sql = "SELECT customer_code, balance_cents FROM account_balances"
+        args = ()
+        if params.get('min_balance_cents'):
+            sql += " WHERE balance_cents >= ?"
+            args = (int(params['min_balance_cents']),)
+        with storage.pool.connection() as conn:
+            cursor = conn.execute(sql + " ORDER BY balance_cents DESC", args)
+            while True:
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    return
+                page_aging = aging.by_customer([row['customer_code'] for row in rows])
+                for row in rows:
+                    customer = page_aging.get(row['customer_code'], {'buckets': {}, 'credit_cents': 0})
+                    yield {**dict(row), **customer['buckets'], 'credit_cents': customer['credit_cents']}
+
+
+def _load_font(pdf, family, path):
+    """
+    Registra una fuente TTF en el documento con la API pública de fpdf2. La
+    ruta se resuelve y comprueba una vez por proceso; cada documento analiza
+    la fuente de nuevo porque fpdf2 la recorta al guardar el PDF.
+    """
+    resolved = _font_cache.get(str(path))
+    if resolved is None:
+        font_file = Path(path).expanduser().resolve()
+        if not font_file.is_file():
+            raise ReportError(f"No se encontró la fuente {path} (backend.reports.font_path)")
+        resolved = _font_cache[str(path)] = str(font_file)
+    pdf.add_font(family, fname=resolved)
+
+
+def _get_template(report_type, font_path):
+    """Plantilla del reporte: orientación y anchos de columna en mm (cacheada por proceso)"""
+    key = (report_type, font_path)
+    template = _template_cache.get(key)
+    if template is None:
+        from fpdf import FPDF
+
+        layout = REPORT_LAYOUTS[report_type]
+        probe = FPDF(orientation=layout['orientation'], format='A4')
+        usable = probe.epw
+        total = sum(column[2] for column in layout['columns'])
+        template = _template_cache[key] = {
+            'title': layout['title'],
+            'orientation': layout['orientation'],
+            'columns': [(name, header, usable * width / total, align, kind)
+                        for name, header, width, align, kind in layout['columns']],
+        }
+    return template
+
+
+def _report_pdf_class():
+    """
+    Clase del documento (subclase de FPDF). Se define la primera vez que se
+    pide, en el proceso del pool: el servidor arranca sin importar fpdf2.
+    """
+    global _report_pdf
+    if _report_pdf is not None:
+        return _report_pdf
+    from fpdf import FPDF
+
+    class ReportPDF(FPDF):
+        """PDF con cabecera de tabla repetida en cada página y pie con numeración"""
+
+        def __init__(self, template, subtitle, family):
+            super().__init__(orientation=template['orientation'], format='A4')
+            self.template = template
+            self.subtitle = subtitle
+            self.family = family
+            self.set_auto_page_break(auto=True, margin=15)
+
+        def latin(self, value):
+            # Las fuentes base de PDF solo cubren latin-1
+            if self.family == CORE_FONT:
+                return value.encode('latin-1', 'replace').decode('latin-1')
+            return value
+
+        def header(self):
+            self.set_font(self.family, 'B' if self.family == CORE_FONT else '', 14)
+            self.cell(0, 8, self.latin(self.template['title']), new_x='LMARGIN', new_y='NEXT')
+            self.set_font(self.family, '', 8)
+            self.cell(0, 5, self.latin(self.subtitle), new_x='LMARGIN', new_y='NEXT')
+            self.ln(2)
+            self.set_fill_color(230, 230, 230)
+            for _, title, width, align, _ in self.template['columns']:
+                self.cell(width, 6, self.latin(title), border=1, align=align, fill=True)
+            self.ln()
+
+        def footer(self):
+            self.set_y(-12)
+            self.set_font(self.family, '', 8)
+            self.cell(0, 6, f"{self.page_no()}/{{nb}}", align='C')
+
+        def add_row(self, row):
+            for name, _, width, align, kind in self.template['columns']:
+                self.cell(width, 5, self.latin(_format_value(row.get(name), kind)), border='B', align=align)
+            self.ln()
+
+    _report_pdf = ReportPDF
+    return ReportPDF
+
+
+def render_report(report_type, params, target):
+    """
+    Se ejecuta en un proceso del pool: genera el PDF y lo guarda en `target`.
+    Se escribe a un temporal y se renombra, para no servir nunca un PDF a medias.
+    El PDF se construye en memoria (fpdf2 no escribe páginas sueltas): la
+    memoria del proceso crece con el número de páginas.
+    """
+    font_path = get_setting('backend.reports.font_path', None)
+    template = _get_template(report_type, font_path)
+    subtitle = ' · '.join(f"{key}={value}" for key, value in params.items()) or 'Todos los datos'
+    subtitle = f"{subtitle} · generado {time.strftime('%Y-%m-%d %H:%M')}"
+
+    family = 'report' if font_path else CORE_FONT
+    pdf = _report_pdf_class()(template, subtitle, family)
+    if font_path:
+        _load_font(pdf, family, font_path)
+    pdf.add_page()
+    rows = 0
+    for row in _iter_report_rows(report_type, params):
+        pdf.add_row(row)
+        rows += 1
+
+    target = Path(target)
+    tmp_path = target.with_name(f".tmp-{target.stem}-{uuid.uuid4().hex[:8]}.pdf")
+    try:
+        pdf.output(str(tmp_path))
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return {'rows': rows, 'pages': pdf.pages_count, 'size_bytes': target.stat().st_size}
+
+
+def data_version(storage, report_type):
+    """
+    Versiones de las tablas que lee el reporte: cambian con cada carga, cada
+    sincronización del libro y, en ventas, cada fusión o reconstrucción del cubo
+    """
+    return storage.data_versions(*REPORT_TABLES[report_type])
+
+
+class ReportRenderer:
+    """
+    Pool de procesos para generar reportes y caché de artefactos en disco.
+    Dos peticiones iguales a la vez comparten el mismo renderizado.
+    """
+
+    def __init__(self, directory, max_workers, max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def artifact_key(self, report_type, params, version):
+        payload = json.dumps({'type': report_type, 'params': params, 'version': version}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def artifact_path(self, report_type, key):
+        return self.directory / f"{report_type}-{key}.pdf"
+
+    async def get_report(self, report_type, params):
+        """Devuelve (ruta del PDF, si salió de la caché)"""
+        params = normalize_params(report_type, params)
+        # Las consultas a SQLite van en un hilo para no bloquear el event loop
+        version = await asyncio.to_thread(data_version, get_storage(), report_type)
+        key = self.artifact_key(report_type, params, version)
+        path = self.artifact_path(report_type, key)
+        if path.exists():
+            os.utime(path)
+            return path, True
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(render_report, report_type, params, str(path))
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+        await asyncio.wrap_future(future)
+        self._evict(keep=path)
+        return path, False
+
+    def _evict(self, keep=None):
+        """Elimina los PDF menos usados (por mtime) hasta quedar por debajo del límite"""
+        files = sorted(self.directory.glob("*.pdf"), key=lambda f: f.stat().st_mtime, reverse=True)
+        total = sum(f.stat().st_size for f in files)
+        for file in reversed(files):
+            if total <= self.max_bytes:
+                break
+            if file == keep or file.name.startswith('.'):
+                continue
+            total -= file.stat().st_size
+            file.unlink(missing_ok=True)
+
+    def stats(self):
+        files = [f for f in self.directory.glob("*.pdf") if not f.name.startswith('.')]
+        return {
+            'artifacts': len(files),
+            'total_bytes': sum(f.stat().st_size for f in files),
+            'max_bytes': self.max_bytes,
+            'rendering': len(self._pending),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_report_renderer():
+    """Devuelve el generador de reportes configurado (backend.reports.*)"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            max_mb = float(get_setting('backend.reports.max_mb', 256))
+            _renderer = ReportRenderer(
+                get_data_dir("reports"),
+                max_workers=int(get_setting('backend.reports.workers', 2)),
+                max_bytes=int(max_mb * 1024 * 1024),
+            )
+    return _renderer
+
+
+def shutdown_report_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is not None:
+            _renderer.shutdown()
+            _renderer = None
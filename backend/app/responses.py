@@ -0,0 +1,182 @@
+"""
+Respuestas JSON rápidas y compresión HTTP
+
+- FastJSONResponse: serializa con orjson (numpy, fechas, pandas) sin pasar
+  por jsonable_encoder de FastAPI. Es opcional por ruta: la ruta devuelve
+  FastJSONResponse(resultado) en lugar del dict. Sin orjson usa json.
+- ETag: las rutas de datos calculan una etiqueta con los contadores de
+  versión de sus tablas (data_versions en SQLite) y la URL; si coincide con
+  If-None-Match responden 304 sin calcular ni serializar el cuerpo.
+- CompressionMiddleware: comprime con brotli (si está instalado) o gzip las
+  respuestas completas a partir de un tamaño mínimo. Las respuestas por
+  streaming (SSE, Excel, PDF) pasan sin tocar.
+"""
+import datetime
+import decimal
+import gzip
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml', 'application/xml')
+
+
+def _default(value):
+    """Tipos que ni orjson ni json saben serializar por sí solos"""
+    # Si numpy/pandas no se han importado el valor no puede ser de sus tipos:
+    # no se cargan solo para comprobarlo
+    pd = sys.modules.get('pandas')
+    np = sys.modules.get('numpy')
+    if pd is not None and isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if np is not None and isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if np is not None and isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Path):
+        return str(value)
+    if pd is not None and (value is pd.NaT or value is pd.NA):
+        return None
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    """Serializa a bytes JSON (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson (admite numpy, fechas y tipos de pandas)"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def make_etag(request, *versions):
+    """ETag débil a partir de la ruta, los parámetros y las versiones de los datos"""
+    query = '&'.join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    token = '|'.join([request.url.path, query, *map(str, versions)])
+    return f'W/"{hashlib.blake2b(token.encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """True si el cliente ya tiene esta versión (If-None-Match)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    # La comparación de If-None-Match es débil: se ignora el prefijo W/
+    return '*' in candidates or etag.removeprefix('W/') in [value.removeprefix('W/') for value in candidates]
+
+
+def etag_headers(etag):
+    # no-cache: el navegador puede guardar la respuesta pero debe revalidarla siempre
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+def _choose_encoding(accept_encoding):
+    """'br' si el cliente lo acepta y brotli está instalado, si no 'gzip', o None"""
+    accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',') if part.strip()}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compresión. Solo comprime respuestas que llegan en un
+    único bloque (no streaming), de tipo texto/JSON, sin Content-Encoding
+    previo y de al menos `minimum_size` bytes.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, passthrough
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+            if start_message is not None:
+                initial, start_message = start_message, None
+                body = message.get('body', b'')
+                if message.get('more_body', False) or not self._should_compress(initial, body):
+                    passthrough = True
+                    await send(initial)
+                    await send(message)
+                    return
+                compressed = self._compress(body, encoding)
+                headers = MutableHeaders(raw=initial['headers'])
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(compressed))
+                headers.add_vary_header('Accept-Encoding')
+                await send(initial)
+                await send({'type': 'http.response.body', 'body': compressed})
+                return
+            await send(message)
+
+        await self.app(scope, receive, compressing_send)
+        if start_message is not None:
+            # Respuesta sin cuerpo
+            await send(start_message)
+
+    def _should_compress(self, start, body):
+        if len(body) < self.minimum_size:
+            return False
+        headers = Headers(raw=start['headers'])
+        if 'content-encoding' in headers:
+            return False
+        content_type = headers.get('content-type', '')
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
@@ -0,0 +1,231 @@
+"""
+Caché de resultados de reportes con invalidación por dependencias
+Los reportes (indicador de ventas, saldos, ...) se leen mucho más a menudo de
+lo que cambian los datos. Cada resultado se guarda en memoria con la clave
+(tipo de reporte, parámetros normalizados) y la lista de datos de los que
+depende: tablas enteras ('balances') o particiones por mes ('sales:2026-03').
+
+Cuando una ingesta cambia ventas de marzo se invalida 'sales:2026-03' y solo
+caen los resultados que leen marzo (o toda la tabla de ventas). Además hay
+expiración por tiempo (TTL) y un presupuesto de memoria con expulsión LRU.
+
+Con varios workers de uvicorn cada proceso tiene su propia memoria, así que
+las invalidaciones se registran también en SQLite como contadores por
+etiqueta (cache_generations). Cada resultado recuerda los contadores de sus
+etiquetas al calcularse y deja de servirse en cuanto alguno sube, lo
+invalide el proceso que sea.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .settings import get_setting
+    from .storage import get_storage
+except ImportError:
+    from settings import get_setting
+    from storage import get_storage
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def month_tags(table, start=None, end=None):
+    """
+    Etiquetas de dependencia de un rango de fechas: una por mes
+    ('sales:2026-03', ...) o la tabla entera si el rango está abierto.
+    """
+    if not start or not end:
+        return [table]
+    # pandas se importa al usarlo: el servidor arranca sin cargarlo
+    import pandas as pd
+
+    months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq='M')
+    return [f"{table}:{month}" for month in months.strftime('%Y-%m')]
+
+
+def normalize_key(report_type, params):
+    """Clave estable: tipo + parámetros sin vacíos, ordenados y como texto"""
+    clean = {key: value for key, value in params.items() if value not in (None, '', [], ())}
+    return report_type + ':' + json.dumps(clean, sort_keys=True, default=str, separators=(',', ':'))
+
+
+def generation_keys(tag):
+    """
+    Contadores de los que depende una etiqueta. 'sales:2026-03' depende del
+    mes y de la tabla entera; 'sales' depende de la tabla y de cualquier mes
+    ('sales:*'). Todas dependen además de '*', que sube al vaciar la caché.
+    """
+    table, _, partition = tag.partition(':')
+    return (tag, table, '*') if partition else (table, f"{table}:*", '*')
+
+
+def _bumped_keys(tag):
+    """Contadores que sube la invalidación de una etiqueta"""
+    table, _, partition = tag.partition(':')
+    return (tag, f"{table}:*") if partition else (table,)
+
+
+def _estimate_bytes(value):
+    return len(json.dumps(value, default=str))
+
+
+class ResultCache:
+    """
+    LRU en memoria con TTL, presupuesto de bytes e índice etiqueta -> claves.
+    Con `storage` las invalidaciones se comparten entre procesos.
+    """
+
+    def __init__(self, max_bytes, ttl_seconds, storage=None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.storage = storage
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def generations(self, tags):
+        """Contadores compartidos actuales de las etiquetas ({} sin almacenamiento)"""
+        if self.storage is None or not tags:
+            return {}
+        keys = sorted({key for tag in tags for key in generation_keys(tag)})
+        with self.storage.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT tag, generation FROM cache_generations WHERE tag IN ({', '.join('?' for _ in keys)})", keys
+            ).fetchall()
+        current = dict.fromkeys(keys, 0)
+        current.update((row['tag'], row['generation']) for row in rows)
+        return current
+
+    def get(self, key):
+        """Devuelve el resultado guardado (y lo marca como reciente) o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        # Otro proceso pudo invalidar las etiquetas del resultado
+        stale = entry is not None and self.generations(entry['tags']) != entry['generations']
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (stale or entry['expires_at'] <= time.monotonic()):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['value']
+
+    def put(self, key, value, tags, generations=None):
+        """Guarda un resultado; `generations` son los contadores leídos antes de calcularlo"""
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        if generations is None:
+            generations = self.generations(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'value': value,
+                'tags': tuple(tags),
+                'generations': generations,
+                'size': size,
+                'expires_at': time.monotonic() + self.ttl_seconds,
+            }
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def get_or_compute(self, key, tags, compute):
+        """Resultado guardado o, si no lo hay, compute() guardado bajo sus etiquetas"""
+        value = self.get(key)
+        if value is None:
+            # Se leen antes de calcular: una invalidación durante el cálculo no se pierde
+            generations = self.generations(tags)
+            value = compute()
+            self.put(key, value, tags, generations)
+        return value
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+        for tag in entry['tags']:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags):
+        """
+        Expulsa los resultados que dependen de alguna de las etiquetas.
+        'sales:2026-03' afecta a quien dependa de ese mes o de 'sales' entero;
+        'sales' afecta a todas las particiones de ventas.
+        """
+        if self.storage is not None and tags:
+            self._bump(sorted({key for tag in tags for key in _bumped_keys(tag)}))
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                table, _, partition = tag.partition(':')
+                keys |= self._tags.get(tag, set()) | self._tags.get(table, set())
+                if not partition:
+                    for other, other_keys in self._tags.items():
+                        if other.startswith(table + ':'):
+                            keys |= other_keys
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+            self.invalidated += len(keys)
+            return len(keys)
+
+    def _bump(self, keys):
+        with self.storage.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO cache_generations (tag, generation) VALUES (?, 1) "
+                "ON CONFLICT(tag) DO UPDATE SET generation = generation + 1",
+                [(key,) for key in keys],
+            )
+
+    def clear(self):
+        """Vacía la caché en todos los procesos (sube el contador global '*')"""
+        if self.storage is not None:
+            self._bump(['*'])
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+            return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidated': self.invalidated,
+                'tags': len(self._tags),
+            }
+
+
+def get_result_cache():
+    """Devuelve la caché de resultados configurada (backend.result_cache.*)"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            max_mb = float(get_setting('backend.result_cache.max_mb', 64))
+            _result_cache = ResultCache(int(max_mb * 1024 * 1024),
+                                        float(get_setting('backend.result_cache.ttl_seconds', 600)),
+                                        get_storage())
+    return _result_cache
@@ -1,5 +1,8 @@
 import os
 import sys
+import argparse
+import subprocess
+import multiprocessing
 import uvicorn
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -10,10 +13,16 @@ from pathlib import Path
 # Importar la aplicación principal
 try:
     from .main import app
+    from .responses import CompressionMiddleware
+    from .settings import get_setting
+    from .static import ProductionFrontend
 except ImportError:
     import sys
     sys.path.append(str(Path(__file__).parent))
     from main import app
+    from responses import CompressionMiddleware
+    from settings import get_setting
+    from static import ProductionFrontend
 
 def get_frontend_dist_path():
     """Obtiene la ruta al frontend compilado (dist)"""
@@ -32,11 +41,26 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # El frontend lee el ETag para enviarlo luego en If-None-Match
+        expose_headers=["ETag"],
     )
 
+    # Compresión gzip/brotli de las respuestas completas (no streaming) grandes
+    if get_setting('backend.compression.enabled', True):
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=int(get_setting('backend.compression.minimum_size', 1024)),
+            gzip_level=int(get_setting('backend.compression.gzip_level', 6)),
+            brotli_quality=int(get_setting('backend.compression.brotli_quality', 4)),
+        )
+
     # Montar archivos estáticos del frontend solo si existe el build
     dist_path = get_frontend_dist_path()
-    if dist_path.exists():
+    if dist_path.exists() and get_setting('build.mode', 'development') == 'production':
+        # Variantes .br/.gz precomprimidas, assets inmutables e index.html en memoria.
+        # Van delante del resto de rutas para que "/" sirva el frontend
+        app.router.routes[0:0] = ProductionFrontend(dist_path).routes()
+    elif dist_path.exists():
         app.mount("/static", StaticFiles(directory=str(dist_path)), name="static")
         @app.get("/")
         async def serve_frontend():
@@ -49,10 +73,102 @@ def create_app():
         print("💡 Ejecuta 'npm run build' en el directorio frontend si quieres servir el frontend en producción")
     return app
 
-def run_server(host="0.0.0.0", port=8000):
-    """Ejecuta el servidor FastAPI"""
-    app_instance = create_app()
-    uvicorn.run(app_instance, host=host, port=port)
+# Cadena de importación de create_app para que cada worker cree su propia app
+APP_FACTORY = f"{'server' if __name__ == '__main__' else __name__}:create_app"
+LOOP_OPTIONS = {'uvloop': 'uvloop', 'asyncio': 'asyncio', 'auto': 'auto'}
+HTTP_OPTIONS = {'httptools': 'httptools', 'h11': 'h11', 'auto': 'auto'}
+
+def _server_option(name, options):
+    """backend.loop / backend.http; si el paquete pedido no está instalado se usa 'auto'"""
+    value = str(get_setting(f'backend.{name}', 'auto')).lower()
+    if value not in options:
+        print(f"⚠️ backend.{name}='{value}' no es válido ({', '.join(options)}); se usa 'auto'")
+        return 'auto'
+    if value != 'auto':
+        try:
+            __import__(options[value])
+        except ImportError:
+            print(f"⚠️ backend.{name}='{value}' requiere el paquete {options[value]}; se usa 'auto'")
+            return 'auto'
+    return value
+
+def run_server(host=None, port=None):
+    """
+    Ejecuta el servidor FastAPI.
+    Con backend.workers > 1 uvicorn arranca varios procesos, cada uno con su app
+    (la fábrica create_app); el estado compartido vive en SQLite. El ejecutable
+    de PyInstaller usa siempre un solo proceso.
+    """
+    host = host or get_setting('backend.host', '0.0.0.0')
+    port = int(port or get_setting('backend.port', 8000))
+    workers = max(1, int(get_setting('backend.workers', 1)))
+    if workers > 1 and getattr(sys, 'frozen', False):
+        print("⚠️ El ejecutable empaquetado usa un solo worker")
+        workers = 1
+    options = {'host': host, 'port': port, 'loop': _server_option('loop', LOOP_OPTIONS),
+               'http': _server_option('http', HTTP_OPTIONS)}
+    if workers > 1:
+        print(f"🚀 Iniciando {workers} workers en http://{host}:{port}")
+        uvicorn.run(APP_FACTORY, factory=True, workers=workers, **options)
+    else:
+        uvicorn.run(create_app(), **options)
+
+# Paquetes pesados que deben importarse solo al usarlos, nunca al arrancar
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'openpyxl', 'fpdf')
+
+def profile_startup(top=15):
+    """
+    Mide el coste de importar el servidor con `python -X importtime` en un
+    proceso limpio y muestra los paquetes y módulos más lentos.
+    """
+    if getattr(sys, 'frozen', False):
+        print("⚠️ --profile-startup necesita Python (no funciona en el ejecutable empaquetado)")
+        return 1
+    app_dir = Path(__file__).parent
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f"import sys; import server; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=str(app_dir), capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"❌ No se pudo importar el servidor:\n{result.stderr[-2000:]}")
+        return 1
+
+    # Formato de cada línea: "import time: <propio us> | <acumulado us> | <sangría><módulo>"
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own), int(cumulative)))
+    total = sum(own for _, own, _ in modules)
+    packages = {}
+    for name, own, _ in modules:
+        root = name.split('.')[0]
+        packages[root] = packages.get(root, 0) + own
+
+    print(f"⏱️ Importar el servidor: {total / 1000:.0f} ms ({len(modules)} módulos)")
+    print(f"\n📦 Paquetes más lentos (tiempo propio de todos sus módulos):")
+    for root, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"   {own / 1000:8.1f} ms  {root}")
+    print(f"\n🐢 Módulos más lentos (tiempo propio):")
+    for name, own, cumulative in sorted(modules, key=lambda item: -item[1])[:top]:
+        print(f"   {own / 1000:8.1f} ms  {name}  (acumulado {cumulative / 1000:.1f} ms)")
+
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    if loaded:
+        print(f"\n⚠️ Se importan al arrancar: {', '.join(loaded)} (deberían importarse solo al usarse)")
+    else:
+        print(f"\n✅ Ningún paquete pesado ({', '.join(HEAVY_MODULES)}) se importa al arrancar")
+    return 0
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    # Necesario para el pool de procesos en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Servidor backend de Cubo App")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Muestra el tiempo de importación por paquete y módulo (python -X importtime)")
+    parser.add_argument('--top', type=int, default=15, help="Filas a mostrar con --profile-startup")
+    args = parser.parse_args()
+    if args.profile_startup:
+        sys.exit(profile_startup(args.top))
+    run_server()
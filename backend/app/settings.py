@@ -0,0 +1,61 @@
+"""
+Configuración del backend de Cubo App
+Lee config.yml desde la raíz del proyecto (o junto al ejecutable)
+"""
+import sys
+from pathlib import Path
+from typing import Any
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+_config_data = None
+
+
+def get_project_root() -> Path:
+    """Obtiene la raíz del proyecto (o la carpeta del ejecutable si está empaquetado)"""
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent
+    return Path(__file__).parent.parent.parent
+
+
+def _load_config() -> dict:
+    """Carga config.yml una sola vez; devuelve {} si no existe o no se puede leer"""
+    global _config_data
+    if _config_data is None:
+        _config_data = {}
+        config_path = get_project_root() / "config.yml"
+        if yaml is not None and config_path.exists():
+            try:
+                with open(config_path, 'r', encoding='utf-8') as file:
+                    _config_data = yaml.safe_load(file) or {}
+            except Exception as e:
+                print(f"⚠️ No se pudo leer {config_path}: {e}")
+    return _config_data
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """
+    Obtiene un valor de configuración usando notación de puntos.
+
+    Args:
+        key: Clave en formato 'seccion.subseccion.valor'
+        default: Valor por defecto si no se encuentra o es null
+    """
+    value = _load_config()
+    try:
+        for k in key.split('.'):
+            value = value[k]
+    except (KeyError, TypeError):
+        return default
+    return default if value is None else value
+
+
+def get_data_dir(*parts: str) -> Path:
+    """Devuelve (y crea) un directorio dentro de backend.data_dir"""
+    base = Path(get_setting('backend.data_dir', get_project_root() / "data"))
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
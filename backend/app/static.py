@@ -0,0 +1,137 @@
+"""
+Servidor de archivos del frontend compilado para producción
+- Variantes precomprimidas (.br/.gz) generadas al compilar (build.py) y
+  elegidas según Accept-Encoding, sin comprimir en cada petición
+- Los archivos con hash de Vite (assets/index-3f9a1c2b.js) no cambian nunca:
+  Cache-Control immutable por un año
+- index.html se guarda en memoria (con sus variantes comprimidas) y se
+  revalida siempre (no-cache) para que una nueva versión se vea al momento
+- Peticiones condicionales (If-None-Match / If-Modified-Since) -> 304
+
+Así, tras la primera visita el navegador carga el frontend casi entero desde
+su caché y solo revalida index.html.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Vite añade al nombre un hash de 8 caracteres: index-BQ3x_9aZ.js
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def _accepted_encodings(request):
+    header = request.headers.get('accept-encoding', '')
+    return {part.split(';')[0].strip().lower() for part in header.split(',') if part.strip()}
+
+
+def _not_modified(request, etag, last_modified=None):
+    """Evalúa If-None-Match (prioritario) o If-Modified-Since"""
+    headers = Headers(scope=request.scope)
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag.removeprefix('W/') in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ProductionFrontend:
+    """Rutas para servir frontend/dist en modo producción"""
+
+    def __init__(self, dist_path):
+        self.dist_path = Path(dist_path).resolve()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        """index.html y sus variantes comprimidas, en memoria"""
+        index_file = self.dist_path / "index.html"
+        if not index_file.exists():
+            return None
+        body = index_file.read_bytes()
+        variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+        return {
+            'variants': variants,
+            'etag': f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            'last_modified': index_file.stat().st_mtime,
+        }
+
+    def routes(self):
+        return [
+            Route("/", self.serve_index, methods=["GET", "HEAD"]),
+            Route("/index.html", self.serve_index, methods=["GET", "HEAD"]),
+            Route("/assets/{path:path}", self.serve_asset, methods=["GET", "HEAD"]),
+            Route("/static/{path:path}", self.serve_file, methods=["GET", "HEAD"]),
+        ]
+
+    async def serve_index(self, request):
+        if self.index is None:
+            return Response("Frontend no encontrado", status_code=404)
+        etag = self.index['etag']
+        headers = {'ETag': etag, 'Cache-Control': REVALIDATE, 'Vary': 'Accept-Encoding',
+                   'Last-Modified': formatdate(self.index['last_modified'], usegmt=True)}
+        if _not_modified(request, etag, self.index['last_modified']):
+            return Response(status_code=304, headers=headers)
+        accepted = _accepted_encodings(request)
+        encoding = next((name for name in ('br', 'gzip') if name in accepted and name in self.index['variants']),
+                        'identity')
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        body = self.index['variants'][encoding]
+        return Response(body if request.method == 'GET' else b'', media_type='text/html', headers={
+            **headers, 'Content-Length': str(len(body))})
+
+    async def serve_asset(self, request):
+        return self._file_response(request, "assets/" + request.path_params['path'])
+
+    async def serve_file(self, request):
+        return self._file_response(request, request.path_params['path'])
+
+    def _resolve(self, relative):
+        path = (self.dist_path / relative).resolve()
+        # Nunca fuera de dist (../../)
+        if self.dist_path not in path.parents or not path.is_file():
+            return None
+        return path
+
+    def _file_response(self, request, relative):
+        path = self._resolve(relative)
+        if path is None or path.suffix in ('.gz', '.br'):
+            return Response("No encontrado", status_code=404)
+        stat = path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = IMMUTABLE if HASHED_NAME.search(path.name) else REVALIDATE
+        headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding',
+                   'Last-Modified': formatdate(stat.st_mtime, usegmt=True)}
+        if _not_modified(request, etag, stat.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        accepted = _accepted_encodings(request)
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            variant = path.with_name(path.name + suffix)
+            if encoding in accepted and variant.is_file():
+                headers['Content-Encoding'] = encoding
+                path = variant
+                break
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=path.stat())
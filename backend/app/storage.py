@@ -0,0 +1,459 @@
+"""
+Almacenamiento SQLite para Ventas, Inventario, Clientes y Saldos
+Usa WAL (lectores y un escritor a la vez sin bloquearse), un pool pequeño de
+conexiones seguro para el threadpool de FastAPI y sentencias con parámetros
+'?' de texto constante, que sqlite3 prepara una vez y reutiliza por conexión.
+"""
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    from .settings import get_data_dir, get_setting
+except ImportError:
+    from settings import get_data_dir, get_setting
+
+INSERT_BATCH_ROWS = 5000
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+
+class StorageBusy(Exception):
+    """Otra conexión mantuvo el bloqueo de escritura más allá del tiempo de espera"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    city TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY,
+    sku TEXT NOT NULL UNIQUE,
+    name TEXT,
+    category TEXT,
+    price_cents INTEGER,
+    stock INTEGER
+);
+-- (category) lleva id (rowid) como desempate implícito: sirve al orden por (category, id) de la paginación
+DROP INDEX IF EXISTS idx_inventory_category;
+CREATE INDEX IF NOT EXISTS idx_inventory_category_id ON inventory(category);
+CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name);
+CREATE INDEX IF NOT EXISTS idx_inventory_price ON inventory(price_cents);
+
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY,
+    sale_date TEXT NOT NULL,
+    customer_code TEXT,
+    sku TEXT,
+    store TEXT,
+    quantity INTEGER,
+    amount_cents INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales(customer_code, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_sku ON sales(sku, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_store ON sales(store, sale_date);
+
+CREATE TABLE IF NOT EXISTS balances (
+    id INTEGER PRIMARY KEY,
+    customer_code TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    due_date TEXT,
+    document TEXT,
+    amount_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_balances_customer ON balances(customer_code, entry_date);
+CREATE INDEX IF NOT EXISTS idx_balances_due ON balances(due_date);
+
+-- Libro de saldos: saldo acumulado por cliente, partidas abiertas y fotos periódicas
+CREATE TABLE IF NOT EXISTS account_balances (
+    id INTEGER PRIMARY KEY,
+    customer_code TEXT NOT NULL UNIQUE,
+    balance_cents INTEGER NOT NULL,
+    movements INTEGER NOT NULL,
+    last_movement_id INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_account_balances_balance ON account_balances(balance_cents);
+
+CREATE TABLE IF NOT EXISTS open_items (
+    movement_id INTEGER PRIMARY KEY,
+    customer_code TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    open_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_open_items_customer ON open_items(customer_code, due_date, movement_id);
+
+CREATE TABLE IF NOT EXISTS ledger_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_movement_id INTEGER NOT NULL,
+    since_snapshot INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    id INTEGER PRIMARY KEY,
+    last_movement_id INTEGER NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ledger_snapshot_balances (
+    snapshot_id INTEGER NOT NULL,
+    customer_code TEXT NOT NULL,
+    balance_cents INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, customer_code)
+) WITHOUT ROWID;
+
+-- Contador por tabla que sube en cada transacción que la modifica (ETag de las rutas)
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Estado compartido entre los procesos del servidor (varios workers de uvicorn)
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_created ON ingest_jobs(created_at);
+
+CREATE TABLE IF NOT EXISTS change_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cache_generations (
+    tag TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ingested_files (
+    digest TEXT PRIMARY KEY,
+    filename TEXT,
+    loaded_at REAL NOT NULL,
+    rows INTEGER NOT NULL
+);
+"""
+
+# Columnas de cada tabla y, para las tablas maestras, la clave natural
+# usada en el upsert (inventario y clientes se actualizan, no se duplican)
+TABLES = {
+    'customers': {'columns': ('code', 'name', 'email', 'phone', 'city'), 'key': 'code',
+                  'required': ('code',)},
+    'inventory': {'columns': ('sku', 'name', 'category', 'price_cents', 'stock'), 'key': 'sku',
+                  'required': ('sku',)},
+    'sales': {'columns': ('sale_date', 'customer_code', 'sku', 'store', 'quantity', 'amount_cents'),
+              'key': None, 'required': ('sale_date',)},
+    'balances': {'columns': ('customer_code', 'entry_date', 'due_date', 'document', 'amount_cents'),
+                 'key': None, 'required': ('customer_code', 'entry_date', 'amount_cents')},
+}
+
+# Nombres de hoja y de columna (en minúsculas) que se reconocen al cargar un libro
+SHEET_ALIASES = {
+    'sales': ('ventas', 'sales'),
+    'inventory': ('inventario', 'inventory', 'productos', 'products'),
+    'customers': ('clientes', 'customers'),
+    'balances': ('saldos', 'balances', 'cartera'),
+}
+COLUMN_ALIASES = {
+    'code': ('codigo', 'código', 'code', 'cliente', 'id_cliente'),
+    'name': ('nombre', 'name', 'descripcion', 'descripción'),
+    'email': ('email', 'correo'),
+    'phone': ('telefono', 'teléfono', 'phone'),
+    'city': ('ciudad', 'city'),
+    'sku': ('sku', 'producto', 'codigo_producto', 'código', 'codigo', 'referencia'),
+    'category': ('categoria', 'categoría', 'category', 'linea', 'línea'),
+    'price_cents': ('precio', 'price', 'valor'),
+    'stock': ('stock', 'existencias', 'cantidad'),
+    'sale_date': ('fecha', 'date', 'fecha_venta'),
+    'customer_code': ('cliente', 'codigo_cliente', 'customer'),
+    'store': ('tienda', 'sucursal', 'store'),
+    'quantity': ('cantidad', 'unidades', 'quantity'),
+    'amount_cents': ('total', 'valor', 'monto', 'importe', 'amount', 'saldo', 'precio'),
+    'entry_date': ('fecha', 'date', 'fecha_documento'),
+    'due_date': ('vencimiento', 'fecha_vencimiento', 'due_date'),
+    'document': ('documento', 'factura', 'document', 'numero'),
+}
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite. Cada conexión se usa por un solo hilo a la vez
+    (se presta y se devuelve), por eso es seguro con check_same_thread=False.
+    """
+
+    def __init__(self, path, size=4, timeout=30.0):
+        self.path = str(path)
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; las transacciones se abren con BEGIN explícito
+            cached_statements=256,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool (creándola si aún no se llegó al tamaño máximo)"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def to_sql_value(value):
+    """Normaliza valores de pandas/numpy/Arrow a tipos que SQLite acepta"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # escalares numpy
+        return to_sql_value(value.item())
+    return value
+
+
+class Storage:
+    """Capa de acceso a datos sobre SQLite"""
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        """Abre una transacción de escritura (BEGIN IMMEDIATE) y la confirma al salir"""
+        with self.pool.connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if 'locked' in str(e) or 'busy' in str(e):
+                    raise StorageBusy("La base de datos está ocupada con otra escritura; inténtalo más tarde") from e
+                raise
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def query(self, sql, params=()):
+        """Ejecuta una consulta de lectura y devuelve una lista de dicts"""
+        with self.pool.connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def insert_sql(self, table):
+        spec = TABLES[table]
+        columns = spec['columns']
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        if spec['key']:
+            updates = ', '.join(f"{c} = COALESCE(excluded.{c}, {c})" for c in columns if c != spec['key'])
+            sql += f" ON CONFLICT({spec['key']}) DO UPDATE SET {updates}"
+        return sql
+
+    def bulk_insert(self, table, rows, conn=None, batch_rows=INSERT_BATCH_ROWS):
+        """
+        Inserta filas (tuplas en el orden de TABLES[table]['columns']) con
+        executemany por lotes. Si no se pasa `conn`, todo va en una sola transacción.
+        """
+        if conn is None:
+            with self.transaction() as conn:
+                return self.bulk_insert(table, rows, conn, batch_rows)
+        sql = self.insert_sql(table)
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                conn.executemany(sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            total += len(batch)
+        return total
+
+    def data_versions(self, *names):
+        """Versión actual de cada tabla pedida (0 si nunca cambió)"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT name, version FROM data_versions WHERE name IN ({', '.join('?' for _ in names)})", names
+            ).fetchall()
+        versions = dict.fromkeys(names, 0)
+        versions.update((row['name'], row['version']) for row in rows)
+        return versions
+
+    def counts(self):
+        with self.pool.connection() as conn:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+    def is_loaded(self, digest):
+        rows = self.query("SELECT 1 FROM ingested_files WHERE digest = ?", (digest,))
+        return bool(rows)
+
+    def close(self):
+        self.pool.close()
+
+
+def bump_data_versions(conn, names):
+    """Sube la versión de las tablas; se llama dentro de la transacción que las modifica"""
+    conn.executemany(
+        "INSERT INTO data_versions (name, version) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+        [(name,) for name in names],
+    )
+
+
+def match_table(sheet_name):
+    """Tabla que corresponde a una hoja por su nombre, o None"""
+    name = sheet_name.strip().lower()
+    for table, aliases in SHEET_ALIASES.items():
+        if name in aliases:
+            return table
+    return None
+
+
+def match_columns(table, source_columns):
+    """
+    Relaciona cada columna de la tabla con una columna del origen.
+    Devuelve {columna_tabla: (columna_origen, escala)}; escala=100 convierte
+    unidades monetarias a centavos cuando el origen no venía ya en centavos.
+    """
+    lookup = {column.strip().lower(): column for column in source_columns}
+    mapping = {}
+    used = set()
+    for column in TABLES[table]['columns']:
+        for alias in COLUMN_ALIASES.get(column, (column,)):
+            if column.endswith('_cents') and f"{alias}_cents" in lookup and f"{alias}_cents" not in used:
+                mapping[column] = (lookup[f"{alias}_cents"], 1)
+            elif alias in lookup and alias not in used:
+                mapping[column] = (lookup[alias], 100 if column.endswith('_cents') else 1)
+            else:
+                continue
+            used.add(mapping[column][0].strip().lower())
+            break
+    return mapping
+
+
+def _scaled(value, scale):
+    value = to_sql_value(value)
+    if scale != 1 and isinstance(value, (int, float)):
+        return int(round(value * scale))
+    return value
+
+
+def iter_sheet_rows(cache, digest, sheet, table):
+    """
+    Recorre una hoja cacheada como tuplas en el orden de TABLES[table]['columns'].
+    Devuelve None si a la hoja le faltan columnas obligatorias de la tabla.
+    """
+    mapping = match_columns(table, sheet['columns'])
+    columns = TABLES[table]['columns']
+    required = [columns.index(c) for c in TABLES[table]['required']]
+    if any(columns[i] not in mapping for i in required):
+        return None
+
+    def rows():
+        for batch in cache.iter_sheet_batches(digest, sheet['name'], INSERT_BATCH_ROWS):
+            data = batch.to_pydict()
+            for index in range(batch.num_rows):
+                row = tuple(
+                    _scaled(data[mapping[c][0]][index], mapping[c][1]) if c in mapping else None
+                    for c in columns
+                )
+                # Las filas sin los campos obligatorios se descartan
+                if all(row[i] is not None for i in required):
+                    yield row
+
+    return rows()
+
+
+def load_cached_workbook(storage, cache, digest, filename=None):
+    """
+    Carga en SQLite las hojas reconocidas de una entrada de la caché columnar.
+    Todo el libro se inserta en una sola transacción y cada archivo (por hash)
+    se carga una sola vez. Devuelve {tabla: filas insertadas}.
+    """
+    meta = cache.lookup(digest)
+    if meta is None or storage.is_loaded(digest):
+        return {}
+    loaded = {}
+    with storage.transaction() as conn:
+        # Otra subida del mismo archivo pudo cargarlo mientras se esperaba el bloqueo
+        if conn.execute("SELECT 1 FROM ingested_files WHERE digest = ?", (digest,)).fetchone():
+            return {}
+        for sheet in meta['sheets']:
+            table = match_table(sheet['name'])
+            rows = iter_sheet_rows(cache, digest, sheet, table) if table else None
+            if rows is None:
+                continue
+            loaded[table] = loaded.get(table, 0) + storage.bulk_insert(table, rows, conn)
+        bump_data_versions(conn, [table for table, rows in loaded.items() if rows])
+        conn.execute(
+            "INSERT INTO ingested_files (digest, filename, loaded_at, rows) VALUES (?, ?, ?, ?)",
+            (digest, filename, time.time(), sum(loaded.values())),
+        )
+    return loaded
+
+
+def get_storage():
+    """Devuelve el almacenamiento configurado (backend.storage.*)"""
+    global _storage, _storage_pid
+    with _storage_lock:
+        # Las conexiones SQLite no deben cruzar un fork: cada proceso abre las suyas
+        if _storage is None or _storage_pid != os.getpid():
+            path = get_setting('backend.storage.path', get_data_dir() / "cubo.db")
+            _storage = Storage(path, int(get_setting('backend.storage.pool_size', 4)))
+            _storage_pid = os.getpid()
+    return _storage
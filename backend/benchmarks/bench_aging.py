@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de antigüedad de cartera (app/aging.py)
+Genera facturas abiertas sintéticas y mide el cálculo vectorizado frente a
+un bucle de Python por factura (sobre una muestra, para no esperar minutos).
+
+Uso:
+    python backend/benchmarks/bench_aging.py [--invoices 1000000] [--customers 50000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.aging import AGING_BUCKETS, compute_aging  # noqa: E402
+
+
+def generate_invoices(invoices, customers, seed=42):
+    """Clientes, vencimientos (último año y medio) y saldos abiertos, ~5% a favor del cliente"""
+    rng = np.random.default_rng(seed)
+    codes = np.array([f"C{i:06d}" for i in range(customers)], dtype=object)[rng.integers(0, customers, invoices)]
+    due_dates = np.datetime64('2026-10-17') - rng.integers(-30, 540, invoices).astype('timedelta64[D]')
+    cents = rng.integers(1000, 5_000_000, invoices)
+    cents[rng.random(invoices) < 0.05] *= -1
+    return codes, due_dates, cents
+
+
+def python_loop_aging(codes, due_dates, cents, as_of):
+    """Referencia: el mismo cálculo factura a factura"""
+    result = {}
+    for code, due, amount in zip(codes, due_dates.tolist(), cents.tolist()):
+        row = result.setdefault(code, [0] * (len(AGING_BUCKETS) + 1))
+        if amount < 0:
+            row[-1] += amount
+            continue
+        days = (as_of - due).days
+        index = 0 if days <= 30 else 1 if days <= 60 else 2 if days <= 90 else 3
+        row[index] += amount
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de antigüedad de cartera")
+    parser.add_argument('--invoices', type=int, default=1_000_000)
+    parser.add_argument('--customers', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--loop-sample', type=int, default=200_000,
+                        help="Facturas para la referencia con bucle de Python")
+    args = parser.parse_args()
+
+    print(f"🧾 Generando {args.invoices:,} facturas abiertas de {args.customers:,} clientes...")
+    codes, due_dates, cents = generate_invoices(args.invoices, args.customers)
+    as_of = np.datetime64('2026-10-17')
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = compute_aging(codes, due_dates, cents, as_of)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"⚡ Vectorizado: {best:.3f} s (mejor de {args.repeat}) -> {args.invoices / best:,.0f} facturas/s")
+
+    sample = min(args.loop_sample, args.invoices)
+    started = time.perf_counter()
+    expected = python_loop_aging(codes[:sample], due_dates[:sample], cents[:sample], as_of.item())
+    loop_seconds = time.perf_counter() - started
+    print(f"🐢 Bucle Python: {loop_seconds:.3f} s para {sample:,} -> {sample / loop_seconds:,.0f} facturas/s")
+    print(f"📈 Aceleración: x{(args.invoices / best) / (sample / loop_seconds):,.1f}")
+
+    check = compute_aging(codes[:sample], due_dates[:sample], cents[:sample], as_of).by_customer()
+    mismatches = sum(
+        1 for code, row in expected.items()
+        if [*check[code]['buckets'].values(), check[code]['credit_cents']] != row
+    )
+    print("✅ Resultados idénticos al bucle de referencia" if not mismatches
+          else f"❌ {mismatches} clientes con resultados distintos")
+    print(f"📊 Totales: {result.totals()}")
+    return 0 if not mismatches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
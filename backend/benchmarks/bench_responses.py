@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización y compresión de respuestas (app/responses.py)
+Sirve una página grande de filas tipo inventario por cuatro rutas: la
+respuesta por defecto de FastAPI y FastJSONResponse, con y sin el
+middleware de compresión, y mide latencia y bytes transferidos.
+
+Uso:
+    python backend/benchmarks/bench_responses.py [--rows 50000] [--repeat 10]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.responses import CompressionMiddleware, FastJSONResponse, brotli, orjson  # noqa: E402
+
+
+def generate_rows(rows, seed=42):
+    """Filas como las de /items: sku, nombre, categoría, precio en céntimos, stock"""
+    rng = np.random.default_rng(seed)
+    categories = ['Bebidas', 'Limpieza', 'Lácteos', 'Panadería', 'Congelados']
+    prices = rng.integers(100, 500_000, rows).tolist()
+    stock = rng.integers(0, 1000, rows).tolist()
+    return [
+        {'id': i + 1, 'sku': f"SKU-{i:07d}", 'name': f"Producto {i}", 'category': categories[i % 5],
+         'price_cents': prices[i], 'stock': stock[i]}
+        for i in range(rows)
+    ]
+
+
+def build_app(payload):
+    app = FastAPI()
+
+    @app.get("/default")
+    def default_json():
+        return payload
+
+    @app.get("/fast", response_class=FastJSONResponse)
+    def fast_json():
+        return FastJSONResponse(payload)
+
+    return app
+
+
+def measure(client, path, encoding, repeat):
+    """Mediana de latencia (ms) y bytes en la red de una ruta"""
+    headers = {'Accept-Encoding': encoding}
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append(time.perf_counter() - started)
+    wire = int(response.headers.get('content-length', len(response.content)))
+    return statistics.median(timings) * 1000, wire, response.headers.get('content-encoding', '-')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de respuestas JSON y compresión")
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"📦 Generando {args.rows:,} filas...")
+    payload = {'values': generate_rows(args.rows), 'next_cursor': None}
+    print(f"⚙️ orjson: {'sí' if orjson else 'no (json)'} | brotli: {'sí' if brotli else 'no (solo gzip)'}")
+
+    plain = TestClient(build_app(payload))
+    compressed_app = build_app(payload)
+    compressed_app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    compressed = TestClient(compressed_app)
+
+    cases = [
+        ('FastAPI por defecto', plain, '/default', 'identity'),
+        ('FastJSONResponse', plain, '/fast', 'identity'),
+        ('FastJSONResponse + gzip', compressed, '/fast', 'gzip'),
+    ]
+    if brotli is not None:
+        cases.append(('FastJSONResponse + brotli', compressed, '/fast', 'br'))
+
+    baseline = None
+    print(f"{'Caso':<28}{'Latencia':>12}{'Bytes':>14}{'Codif.':>9}")
+    for name, client, path, encoding in cases:
+        client.get(path, headers={'Accept-Encoding': encoding})
+        latency, wire, used = measure(client, path, encoding, args.repeat)
+        baseline = baseline or (latency, wire)
+        print(f"{name:<28}{latency:>9.1f} ms{wire:>14,}{used:>9}"
+              f"   (x{baseline[0] / latency:.1f} más rápido, {wire / baseline[1]:.0%} de los bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Construye el ejecutable del backend con PyInstaller
+Controlado por build.pyinstaller en config.yml:
+
+- onefile: false (recomendado) genera una carpeta backend/dist/cubo_app/ con
+  el ejecutable y sus librerías ya descomprimidas: arranca al momento.
+  onefile: true genera un único archivo que en cada arranque descomprime
+  todo en una carpeta temporal (varios segundos con pandas y pyarrow).
+- Se excluyen los tests y herramientas de pandas/numpy/pyarrow y paquetes que
+  el backend nunca importa (exclude_modules añade más)
+- Tras compilar se arranca el ejecutable dos veces y se muestra el tiempo
+  hasta la primera respuesta de / y el tamaño del resultado. Con
+  --skip-frontend esa medida la pide build.py (--measure-only) después de
+  copiar el frontend, para medir la carpeta que realmente se distribuye
+"""
+import argparse
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+PROJECT_DIR = BACKEND_DIR.parent
+sys.path.insert(0, str(PROJECT_DIR))
+# config.py lee config.yml del directorio actual
+os.chdir(PROJECT_DIR)
+
+from config import config  # noqa: E402
+
+APP_NAME = "cubo_app"
+DIST_DIR = BACKEND_DIR / "dist"
+WORK_DIR = BACKEND_DIR / "build"
+# Submódulos que ningún código del backend importa (comprobado bloqueándolos
+# y recorriendo ingesta, cubo, saldos, exportación y reportes)
+DEFAULT_EXCLUDES = (
+    'tkinter', 'matplotlib', 'IPython', 'scipy', 'pytest', 'jinja2',
+    'pandas.tests', 'pandas.io.formats.style', 'pandas.io.clipboard',
+    'numpy.tests', 'numpy.f2py', 'numpy.distutils',
+    'pyarrow.tests',
+)
+COLD_START_TIMEOUT = 60
+
+
+def find_python():
+    """Python del entorno virtual (donde build.py instaló PyInstaller) o el actual"""
+    venv_path = PROJECT_DIR / "venv"
+    if platform.system() == "Windows":
+        python_path = venv_path / "Scripts" / "python.exe"
+    else:
+        python_path = venv_path / "bin" / "python"
+    return str(python_path) if python_path.exists() else sys.executable
+
+
+def executable_path(onefile):
+    name = f"{APP_NAME}.exe" if platform.system() == "Windows" else APP_NAME
+    return DIST_DIR / name if onefile else DIST_DIR / APP_NAME / name
+
+
+def bundle_size(path):
+    """Bytes del ejecutable (onefile) o de toda su carpeta (onedir)"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    # Los enlaces simbólicos de la carpeta (Linux/macOS) no ocupan espacio propio
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file() and not f.is_symlink())
+
+
+def pyinstaller_command(python, onefile, bundle_frontend=True):
+    """Argumentos de PyInstaller según build.pyinstaller"""
+    command = [
+        python, "-m", "PyInstaller", "--noconfirm",
+        "--name", APP_NAME,
+        "--distpath", str(DIST_DIR),
+        "--workpath", str(WORK_DIR),
+        "--specpath", str(WORK_DIR),
+        "--paths", str(BACKEND_DIR / "app"),
+        "--onefile" if onefile else "--onedir",
+        # UPX obliga a descomprimir cada librería al cargarla
+        "--noupx",
+        # uvicorn elige el bucle y el protocolo HTTP por nombre al arrancar
+        "--collect-submodules", "uvicorn",
+    ]
+    if config.get('build.pyinstaller.windowed', True):
+        command.append("--windowed")
+    icon = config.get('build.pyinstaller.icon')
+    if icon:
+        command += ["--icon", str(Path(icon).resolve())]
+    excludes = list(DEFAULT_EXCLUDES) + list(config.get('build.pyinstaller.exclude_modules') or [])
+    for module in excludes:
+        command += ["--exclude-module", module]
+    frontend_dist = PROJECT_DIR / "frontend" / "dist"
+    if bundle_frontend and frontend_dist.exists():
+        command += ["--add-data", f"{frontend_dist}{os.pathsep}frontend/dist"]
+    command.append(str(BACKEND_DIR / "app" / "server.py"))
+    return command
+
+
+def _port_in_use(host, port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex((host, port)) == 0
+
+
+def measure_cold_start(executable, port, timeout=COLD_START_TIMEOUT):
+    """Segundos desde lanzar el ejecutable hasta la primera respuesta 200 de /, o None"""
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    process = subprocess.Popen([str(executable)], cwd=str(Path(executable).parent),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(url, timeout=0.5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, OSError):
+                pass
+            time.sleep(0.05)
+        return None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def report_startup(executable, onefile):
+    """Muestra tamaño y arranque en frío (primer lanzamiento) y en caliente (segundo)"""
+    bundle = executable if onefile else executable.parent
+    print(f"📏 Tamaño ({'onefile' if onefile else 'onedir'}): {bundle_size(bundle) / (1024 * 1024):.1f} MB")
+
+    port = int(config.get('backend.port', 8000))
+    if _port_in_use("127.0.0.1", port):
+        print(f"⚠️ El puerto {port} está en uso: no se mide el arranque")
+        return
+    # El ejecutable crea su carpeta de datos junto a él; se borra si no existía
+    data_dir = executable.parent / "data"
+    had_data = data_dir.exists()
+    try:
+        for label in ("en frío", "en caliente"):
+            seconds = measure_cold_start(executable, port)
+            if seconds is None:
+                print(f"⚠️ El ejecutable no respondió en {COLD_START_TIMEOUT}s ({label})")
+                return
+            print(f"⏱️ Arranque {label}: {seconds:.2f}s hasta la primera respuesta de /")
+    finally:
+        if not had_data and data_dir.exists():
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el ejecutable del backend")
+    parser.add_argument('--skip-frontend', action='store_true',
+                        help="No empaquetar frontend/dist (build.py lo copia después en la carpeta onedir)")
+    parser.add_argument('--measure-only', action='store_true',
+                        help="Solo medir tamaño y arranque del ejecutable ya construido")
+    args = parser.parse_args()
+    onefile = bool(config.get('build.pyinstaller.onefile', False))
+    if args.measure_only:
+        executable = executable_path(onefile)
+        if not executable.exists():
+            print(f"❌ No se encontró el ejecutable en {executable}")
+            return 1
+        report_startup(executable, onefile)
+        return 0
+    python = find_python()
+    print(f"🔧 PyInstaller en modo {'onefile' if onefile else 'onedir (arranque rápido)'}")
+    started = time.perf_counter()
+    try:
+        subprocess.check_call(pyinstaller_command(python, onefile, not args.skip_frontend), cwd=str(BACKEND_DIR))
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error ejecutando PyInstaller: {e}")
+        return 1
+    print(f"✅ PyInstaller terminó en {time.perf_counter() - started:.0f}s")
+
+    executable = executable_path(onefile)
+    if not executable.exists():
+        print(f"❌ No se encontró el ejecutable en {executable}")
+        return 1
+    # settings.py busca config.yml junto al ejecutable
+    config_file = PROJECT_DIR / "config.yml"
+    if config_file.exists():
+        shutil.copy2(config_file, executable.parent / "config.yml")
+    if args.skip_frontend:
+        # Aún falta el frontend: medir ahora daría el arranque de otra carpeta
+        print("⏭️ El tamaño y el arranque se miden cuando build.py copie el frontend")
+    else:
+        report_startup(executable, onefile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
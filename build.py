@@ -1,14 +1,36 @@
 #!/usr/bin/env python3
 """
 Script unificado para construir Cubo App
-Controlado por config.env
+Controlado por config.yml
+
+La construcción es incremental: cada paso (dependencias del backend y del
+frontend, build de Vite, ejecutable de PyInstaller) calcula un hash de sus
+entradas y se salta si no cambiaron desde la última vez y sus salidas siguen
+ahí. Los hashes se guardan en .build_cache/state.json; --force lo rehace todo.
+
+Los pasos que no dependen entre sí se ejecutan a la vez (--jobs): cada línea
+de salida lleva el nombre de su paso y al final se muestra cuánto tardó cada
+uno y la ruta crítica.
 """
 import os
 import sys
+import gzip
+import json
+import hashlib
+import time
+import shutil
+import argparse
 import platform
+import threading
 import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Importar configuración
 from config import config
 
@@ -21,72 +43,332 @@ def check_node_npm():
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
         return False
 
-def install_dependencies():
-    """Instala las dependencias necesarias según configuración"""
-    print("📦 Instalando dependencias...")
-    
-    # Buscar Python del entorno virtual
-    venv_path = Path(__file__).parent / "venv"
-    
+PROJECT_DIR = Path(__file__).parent
+BUILD_CACHE_DIR = PROJECT_DIR / ".build_cache"
+HASH_BLOCK_BYTES = 1024 * 1024
+
+def get_pip_executable():
+    venv_path = PROJECT_DIR / "venv"
     if platform.system() == "Windows":
-        pip_executable = venv_path / "Scripts" / "pip.exe"
-    else:
-        pip_executable = venv_path / "bin" / "pip"
-    
+        return venv_path / "Scripts" / "pip.exe"
+    return venv_path / "bin" / "pip"
+
+def hash_inputs(patterns, settings=None):
+    """
+    Hash de las entradas de un paso: ruta y contenido de cada archivo que
+    coincide con los patrones glob (relativos al proyecto) más los valores de
+    configuración que afectan al resultado.
+    """
+    digest = hashlib.sha256()
+    files = set()
+    for pattern in patterns:
+        files.update(path for path in PROJECT_DIR.glob(pattern)
+                     if path.is_file() and '__pycache__' not in path.parts)
+    for path in sorted(files):
+        digest.update(path.relative_to(PROJECT_DIR).as_posix().encode('utf-8') + b'\0')
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+class BuildCache:
+    """Hash de entradas de la última ejecución correcta de cada paso"""
+
+    def __init__(self, directory=BUILD_CACHE_DIR):
+        self.directory = Path(directory)
+        self.state_file = self.directory / "state.json"
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as file:
+                self.state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.state = {}
+        # Los pasos en paralelo registran su resultado desde hilos distintos
+        self._lock = threading.Lock()
+
+    def is_fresh(self, step, digest, outputs):
+        """El paso ya se ejecutó con estas entradas y sus salidas existen"""
+        return self.state.get(step) == digest and all(Path(output).exists() for output in outputs)
+
+    def record(self, step, digest):
+        with self._lock:
+            self.state[step] = digest
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.state_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.state, file, indent=2, sort_keys=True)
+            os.replace(tmp_file, self.state_file)
+
+def backend_executable():
+    """Ruta del ejecutable según build.pyinstaller.onefile"""
+    exe_name = "cubo_app.exe" if platform.system() == "Windows" else "cubo_app"
+    dist_dir = PROJECT_DIR / "backend" / "dist"
+    if config.get('build.pyinstaller.onefile', False):
+        return dist_dir / exe_name
+    return dist_dir / "cubo_app" / exe_name
+
+def frontend_bundle_dir():
+    """
+    Carpeta donde el ejecutable onedir busca el frontend (sys._MEIPASS/frontend/dist).
+    PyInstaller 6 guarda las librerías en _internal; las versiones anteriores, junto al ejecutable.
+    """
+    bundle = backend_executable().parent
+    contents = bundle / "_internal"
+    return (contents if contents.exists() else bundle) / "frontend" / "dist"
+
+def build_steps():
+    """
+    Pasos de la construcción con sus entradas, salidas y de qué pasos dependen.
+    En onedir el ejecutable se compila sin esperar al frontend y un último paso
+    (package) copia frontend/dist dentro; en onefile el frontend va dentro del
+    archivo, así que PyInstaller tiene que esperar al build de Vite.
+    """
+    steps = []
+    onefile = config.get('build.pyinstaller.onefile', False)
+    if config.is_backend_mode():
+        steps.append({'name': 'backend_deps', 'run': install_backend_dependencies,
+                      'inputs': ['backend/requirements.txt'], 'settings': None,
+                      'outputs': [get_pip_executable()], 'after': ()})
+    if config.is_frontend_mode():
+        steps.append({'name': 'frontend_deps', 'run': install_frontend_dependencies,
+                      'inputs': ['frontend/package.json', 'frontend/package-lock.json'], 'settings': None,
+                      'outputs': [PROJECT_DIR / "frontend" / "node_modules"], 'after': ()})
+        steps.append({'name': 'frontend', 'run': build_frontend,
+                      'inputs': ['frontend/index.html', 'frontend/package-lock.json', 'frontend/vite.config.*',
+                                 'frontend/src/**/*', 'frontend/public/**/*'],
+                      'settings': {'mode': config.build_mode},
+                      'outputs': [PROJECT_DIR / "frontend" / "dist" / "index.html"], 'after': ('frontend_deps',)})
+    if config.is_backend_mode():
+        package_later = config.is_frontend_mode() and not onefile
+        backend_inputs = ['backend/app/**/*.py', 'backend/requirements.txt', 'backend/build_exe.py']
+        if not package_later:
+            backend_inputs.append('frontend/dist/**/*')
+        steps.append({'name': 'backend', 'run': lambda: build_backend(bundle_frontend=not package_later),
+                      'inputs': backend_inputs,
+                      'settings': {'mode': config.build_mode, 'pyinstaller': config.get('build.pyinstaller')},
+                      'outputs': [backend_executable()],
+                      'after': ('backend_deps',) if package_later else ('backend_deps', 'frontend')})
+        if package_later:
+            steps.append({'name': 'package', 'run': package_frontend,
+                          'inputs': ['frontend/dist/**/*'], 'settings': None,
+                          'outputs': [frontend_bundle_dir() / "index.html"], 'after': ('frontend', 'backend')})
+    names = {step['name'] for step in steps}
+    for step in steps:
+        step['after'] = tuple(name for name in step['after'] if name in names)
+    return steps
+
+def run_step(cache, step, force=False):
+    """Ejecuta un paso solo si sus entradas cambiaron o faltan sus salidas; devuelve 'ok', 'skipped' o 'failed'"""
+    digest = hash_inputs(step['inputs'], step['settings'])
+    if not force and cache.is_fresh(step['name'], digest, step['outputs']):
+        print(f"⏭️ Sin cambios ({digest[:12]}), se reutiliza el resultado anterior")
+        return 'skipped'
+    if not step['run']():
+        return 'failed'
+    cache.record(step['name'], digest)
+    return 'ok'
+
+class PrefixedOutput:
+    """
+    Sustituye a sys.stdout mientras corren los pasos en paralelo: cada línea
+    escrita desde el hilo de un paso sale entera y con el nombre del paso delante.
+    """
+
+    def __init__(self, stream, width=0):
+        self.stream = stream
+        self.width = width
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def set_prefix(self, name):
+        self._local.prefix = name
+        self._local.pending = ''
+
+    def write(self, text):
+        prefix = getattr(self._local, 'prefix', None)
+        if prefix is None:
+            with self._lock:
+                self.stream.write(text)
+            return len(text)
+        *lines, self._local.pending = (self._local.pending + text).split('\n')
+        if lines:
+            with self._lock:
+                for line in lines:
+                    self.stream.write(f"[{prefix:<{self.width}}] {line}\n")
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def run_command(command, cwd=None, timeout=None):
+    """
+    Como subprocess.check_call, pero la salida del proceso se reenvía línea a
+    línea por print() para que lleve el prefijo del paso. Lanza las mismas
+    excepciones (CalledProcessError, TimeoutExpired).
+    """
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace', bufsize=1)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+    try:
+        for line in process.stdout:
+            print(line.rstrip('\n'))
+        returncode = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+
+def run_pipeline(steps, jobs, force=False):
+    """
+    Ejecuta los pasos en un pool de hilos en cuanto terminan los pasos de los
+    que dependen. Si uno falla no se lanzan más. Devuelve {paso: resultado}
+    con estado, inicio y fin en segundos desde el arranque.
+    """
+    cache = BuildCache()
+    output = PrefixedOutput(sys.stdout, width=max(len(step['name']) for step in steps))
+    results = {}
+    started = time.perf_counter()
+
+    def execute(step):
+        output.set_prefix(step['name'])
+        begin = time.perf_counter() - started
+        try:
+            status = run_step(cache, step, force)
+        except Exception as e:
+            print(f"❌ Error inesperado: {e}")
+            status = 'failed'
+        return {'status': status, 'start': begin, 'end': time.perf_counter() - started}
+
+    pending = list(steps)
+    running = {}
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            while pending or running:
+                failed = any(result['status'] == 'failed' for result in results.values())
+                for step in list(pending):
+                    if failed:
+                        break
+                    if all(results.get(name, {}).get('status') in ('ok', 'skipped') for name in step['after']):
+                        pending.remove(step)
+                        running[pool.submit(execute, step)] = step
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)['name']] = future.result()
+    finally:
+        sys.stdout = output.stream
+    for step in pending:
+        results[step['name']] = {'status': 'not_run', 'start': None, 'end': None}
+    return results
+
+def critical_path(steps, results):
+    """
+    Cadena de pasos que marcó la duración total: desde el último en terminar
+    se retrocede por la dependencia que terminó más tarde (la que hizo esperar).
+    """
+    after = {step['name']: step['after'] for step in steps}
+    finished = {name: result for name, result in results.items() if result['end'] is not None}
+    if not finished:
+        return []
+    path = [max(finished, key=lambda name: finished[name]['end'])]
+    while True:
+        previous = [name for name in after[path[-1]] if name in finished]
+        if not previous:
+            break
+        path.append(max(previous, key=lambda name: finished[name]['end']))
+    return list(reversed(path))
+
+def print_summary(steps, results, elapsed):
+    """Duración de cada paso, si se saltó, y la ruta crítica"""
+    labels = {'ok': '✅', 'skipped': '⏭️', 'failed': '❌', 'not_run': '⏸️'}
+    width = max(len(step['name']) for step in steps)
+    print()
+    print("⏱️ Resumen de la construcción:")
+    for step in steps:
+        result = results[step['name']]
+        if result['end'] is None:
+            print(f"   {labels[result['status']]} {step['name']:<{width}}  no se ejecutó")
+            continue
+        print(f"   {labels[result['status']]} {step['name']:<{width}}  {result['end'] - result['start']:7.1f}s"
+              f"  ({result['start']:.1f}s -> {result['end']:.1f}s)")
+    path = critical_path(steps, results)
+    if path:
+        busy = sum(results[name]['end'] - results[name]['start'] for name in path)
+        print(f"🧭 Ruta crítica: {' -> '.join(path)} ({busy:.1f}s de {elapsed:.1f}s en total)")
+
+def install_backend_dependencies():
+    """Instala las dependencias del backend y PyInstaller en el entorno virtual"""
+    print("📦 Instalando dependencias del backend...")
+    pip_executable = get_pip_executable()
     if not pip_executable.exists():
         print("❌ No se encontró el entorno virtual")
         print("💡 Ejecuta primero: python install.py")
         return False
     
-    # Instalar dependencias del backend si está habilitado
-    if config.is_backend_mode():
-        backend_dir = Path(__file__).parent / "backend"
-        requirements_file = backend_dir / "requirements.txt"
-        
-        if requirements_file.exists():
-            try:
-                subprocess.check_call([
-                    str(pip_executable), "install", "-r", str(requirements_file)
-                ])
-                print("✅ Dependencias del backend instaladas")
-            except subprocess.CalledProcessError as e:
-                print(f"❌ Error instalando dependencias del backend: {e}")
-                return False
-        
-        # Instalar PyInstaller para backend
+    requirements_file = PROJECT_DIR / "backend" / "requirements.txt"
+    if requirements_file.exists():
         try:
-            subprocess.check_call([
-                str(pip_executable), "install", "pyinstaller"
+            run_command([
+                str(pip_executable), "install", "-r", str(requirements_file)
             ])
-            print("✅ PyInstaller instalado")
+            print("✅ Dependencias del backend instaladas")
         except subprocess.CalledProcessError as e:
-            print(f"❌ Error instalando PyInstaller: {e}")
+            print(f"❌ Error instalando dependencias del backend: {e}")
             return False
     
-    # Instalar dependencias del frontend si está habilitado
-    if config.is_frontend_mode():
-        if not check_node_npm():
-            print("❌ Error: Node.js y npm no están instalados")
-            print("💡 Instala Node.js desde https://nodejs.org")
-            return False
-        
-        frontend_dir = Path(__file__).parent / "frontend"
-        if frontend_dir.exists():
-            node_modules = frontend_dir / "node_modules"
-            if not node_modules.exists():
-                print("📦 Instalando dependencias del frontend...")
-                try:
-                    subprocess.run(["npm", "install"], cwd=frontend_dir, check=True, timeout=300)
-                    print("✅ Dependencias del frontend instaladas")
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ Error instalando dependencias del frontend: {e}")
-                    return False
-                except subprocess.TimeoutExpired:
-                    print("❌ Timeout instalando dependencias del frontend")
-                    return False
+    # Instalar PyInstaller para backend
+    try:
+        run_command([
+            str(pip_executable), "install", "pyinstaller"
+        ])
+        print("✅ PyInstaller instalado")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error instalando PyInstaller: {e}")
+        return False
     
     return True
 
+def install_frontend_dependencies():
+    """Instala las dependencias del frontend (se llama cuando cambia package.json/package-lock.json)"""
+    if not check_node_npm():
+        print("❌ Error: Node.js y npm no están instalados")
+        print("💡 Instala Node.js desde https://nodejs.org")
+        return False
+    
+    frontend_dir = PROJECT_DIR / "frontend"
+    if not frontend_dir.exists():
+        return True
+    print("📦 Instalando dependencias del frontend...")
+    try:
+        run_command(["npm", "install"], cwd=frontend_dir, timeout=300)
+        print("✅ Dependencias del frontend instaladas")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error instalando dependencias del frontend: {e}")
+        return False
+    except subprocess.TimeoutExpired:
+        print("❌ Timeout instalando dependencias del frontend")
+        return False
+    return True
+
 def build_frontend():
     """Construye el frontend con Vite"""
     if not config.is_frontend_mode():
@@ -111,12 +393,12 @@ def build_frontend():
         node_modules = frontend_dir / "node_modules"
         if not node_modules.exists():
             print("📦 Instalando dependencias del frontend...")
-            subprocess.run(["npm", "install"], cwd=frontend_dir, check=True, timeout=300)
+            run_command(["npm", "install"], cwd=frontend_dir, timeout=300)
             print("✅ Dependencias instaladas")
         
         # Construir el frontend
         print("🔨 Construyendo frontend...")
-        subprocess.run(["npm", "run", "build"], cwd=frontend_dir, check=True, timeout=300)
+        run_command(["npm", "run", "build"], cwd=frontend_dir, timeout=300)
         print("✅ Frontend construido")
         
         # Verificar que se creó la carpeta dist
@@ -127,6 +409,11 @@ def build_frontend():
             if files:
                 print(f"📁 Frontend compilado en: {dist_path}")
                 print(f"📄 Archivos generados: {len(files)}")
+                if config.build_mode == 'production':
+                    written, original, compressed = precompress_dist(dist_path)
+                    encodings = "brotli y gzip" if brotli is not None else "gzip (instala brotli para .br)"
+                    print(f"🗜️ Variantes precomprimidas ({encodings}): {written} nuevas, "
+                          f"{original / 1024:.0f} KB -> {compressed / 1024:.0f} KB")
                 return True
             else:
                 print("❌ La carpeta dist está vacía")
@@ -142,8 +429,40 @@ def build_frontend():
         print("❌ Timeout construyendo frontend")
         return False
 
-def build_backend():
-    """Construye el backend con PyInstaller"""
+# Archivos del frontend que vale la pena servir precomprimidos
+COMPRESSIBLE_SUFFIXES = ('.js', '.mjs', '.css', '.html', '.svg', '.json', '.txt', '.map', '.xml', '.ico', '.wasm')
+MIN_COMPRESS_BYTES = 1024
+
+def precompress_dist(dist_path, min_size=MIN_COMPRESS_BYTES):
+    """
+    Genera junto a cada archivo comprimible su .gz (y .br si brotli está
+    instalado) para que el backend en producción no comprima en cada petición.
+    Solo rehace las variantes más antiguas que el original.
+    Devuelve (variantes escritas, bytes originales, bytes de la mejor variante).
+    """
+    written = original_bytes = compressed_bytes = 0
+    for path in Path(dist_path).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        if len(data) < min_size:
+            continue
+        variants = {'.gz': lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = lambda: brotli.compress(data, quality=11)
+        sizes = []
+        for suffix, compress in variants.items():
+            target = path.with_name(path.name + suffix)
+            if not target.exists() or target.stat().st_mtime < path.stat().st_mtime:
+                target.write_bytes(compress())
+                written += 1
+            sizes.append(target.stat().st_size)
+        original_bytes += len(data)
+        compressed_bytes += min(sizes)
+    return written, original_bytes, compressed_bytes
+
+def build_backend(bundle_frontend=True):
+    """Construye el backend con PyInstaller (sin frontend/dist si luego lo copia el paso package)"""
     if not config.is_backend_mode():
         config.log("Modo backend no habilitado")
         return True
@@ -167,8 +486,11 @@ def build_backend():
     build_script = Path(__file__).parent / "backend" / "build_exe.py"
     
     if build_script.exists():
+        command = [sys.executable, str(build_script)]
+        if not bundle_frontend:
+            command.append("--skip-frontend")
         try:
-            subprocess.check_call([sys.executable, str(build_script)], timeout=600)
+            run_command(command, timeout=600)
             print("✅ Backend construido exitosamente")
             return True
         except subprocess.CalledProcessError as e:
@@ -182,6 +504,29 @@ def build_backend():
         print(f"💡 Buscando en: {build_script}")
         return False
 
+def package_frontend():
+    """
+    Copia frontend/dist dentro del ejecutable onedir (donde lo busca server.py)
+    y mide el tamaño y el arranque de la carpeta ya completa
+    """
+    source = PROJECT_DIR / "frontend" / "dist"
+    target = frontend_bundle_dir()
+    if not source.exists():
+        print("❌ No se encontró frontend/dist")
+        return False
+    print(f"📦 Copiando el frontend en {target}")
+    if target.exists():
+        shutil.rmtree(target)
+    shutil.copytree(source, target)
+    print(f"✅ Frontend empaquetado: {sum(1 for f in target.rglob('*') if f.is_file())} archivos")
+    build_script = PROJECT_DIR / "backend" / "build_exe.py"
+    try:
+        run_command([sys.executable, str(build_script), "--measure-only"], timeout=300)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        # La medida es informativa: el paquete ya está completo
+        print(f"⚠️ No se pudo medir el arranque: {e}")
+    return True
+
 def validate_output():
     """Valida que los archivos necesarios se hayan creado"""
     print("🔍 Validando archivos de salida...")
@@ -218,9 +563,13 @@ def validate_output():
             backend_dir / exe_name
         ]
         
+        if not config.get('build.pyinstaller.onefile', False):
+            # onedir: carpeta con el ejecutable y sus librerías
+            possible_paths = [backend_dir / "dist" / "cubo_app" / exe_name]
+        
         backend_found = False
         for path in possible_paths:
-            if path.exists():
+            if path.is_file():
                 if platform.system() != "Windows":
                     if not os.access(path, os.X_OK):
                         try:
@@ -230,7 +579,6 @@ def validate_output():
                             print(f"⚠️ No se pudieron configurar permisos para: {path}")
                 
                 print(f"✅ Backend ejecutable encontrado: {path}")
-                print(f"📏 Tamaño: {path.stat().st_size / (1024*1024):.1f} MB")
                 backend_found = True
                 break
         
@@ -276,10 +624,10 @@ def cleanup_temp_files():
     print("🧹 Limpiando archivos temporales...")
     
     current_dir = Path(__file__).parent
+    # backend/build se conserva: es la caché de análisis de PyInstaller
     temp_dirs = [
         current_dir / "build",
         current_dir / "__pycache__",
-        current_dir / "backend" / "build",
         current_dir / "backend" / "__pycache__"
     ]
     
@@ -301,6 +649,13 @@ def cleanup_temp_files():
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Construye Cubo App")
+    parser.add_argument('--force', action='store_true',
+                        help="Rehace todos los pasos aunque sus entradas no hayan cambiado")
+    parser.add_argument('--jobs', type=int, default=4,
+                        help="Pasos que pueden ejecutarse a la vez (1 = uno detrás de otro)")
+    args = parser.parse_args()
+    
     print("🚀 Construyendo Cubo App (Unificado)")
     print("=" * 40)
     print()
@@ -315,23 +670,17 @@ def main():
             print("💡 Instala Node.js desde https://nodejs.org")
             sys.exit(1)
     
-    # Instalar dependencias
-    if not install_dependencies():
-        print("❌ Error instalando dependencias")
+    # Dependencias, frontend y backend: solo los pasos cuyas entradas cambiaron,
+    # y a la vez los que no dependen entre sí
+    steps = build_steps()
+    started = time.perf_counter()
+    results = run_pipeline(steps, args.jobs, force=args.force)
+    print_summary(steps, results, time.perf_counter() - started)
+    failed = [name for name, result in results.items() if result['status'] == 'failed']
+    if failed:
+        print(f"❌ Error en el paso {', '.join(failed)}")
         sys.exit(1)
     
-    # Construir frontend si está habilitado
-    if config.is_frontend_mode():
-        if not build_frontend():
-            print("❌ Error construyendo frontend")
-            sys.exit(1)
-    
-    # Construir backend si está habilitado
-    if config.is_backend_mode():
-        if not build_backend():
-            print("❌ Error construyendo backend")
-            sys.exit(1)
-    
     # Validar salida
     if not validate_output():
         print("❌ Error validando archivos de salida")
@@ -348,7 +697,10 @@ def main():
     print()
     print("📁 Archivos generados:")
     if config.is_backend_mode():
-        print("   - backend/dist/cubo_app (Linux) o cubo_app.exe (Windows)")
+        if config.get('build.pyinstaller.onefile', False):
+            print("   - backend/dist/cubo_app (Linux) o cubo_app.exe (Windows)")
+        else:
+            print("   - backend/dist/cubo_app/ (carpeta con cubo_app o cubo_app.exe)")
     if config.is_frontend_mode():
         print("   - frontend/dist/ (Frontend compilado)")
     print("   - run_app_new.py (script unificado)")
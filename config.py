@@ -97,7 +97,50 @@ class Config:
                 'port': 8000,
                 'host': 'localhost',
                 'debug': False,
-                'reload': True
+                'reload': True,
+                'workers': 1,
+                'loop': 'auto',
+                'http': 'auto',
+                'data_dir': None,
+                'ingestion': {
+                    'chunk_rows': 5000,
+                    'parallel_sheets': False,
+                    'workers': None
+                },
+                'cache': {
+                    'max_mb': 1024
+                },
+                'jobs': {
+                    'max_workers': 2,
+                    'max_pending': 20
+                },
+                'storage': {
+                    'path': None,
+                    'pool_size': 4
+                },
+                'ledger': {
+                    'snapshot_every': 10000
+                },
+                'reports': {
+                    'workers': 2,
+                    'max_mb': 256,
+                    'font_path': None
+                },
+                'result_cache': {
+                    'max_mb': 64,
+                    'ttl_seconds': 600
+                },
+                'events': {
+                    'buffer': 256,
+                    'max_subscribers': 100,
+                    'heartbeat_seconds': 15
+                },
+                'compression': {
+                    'enabled': True,
+                    'minimum_size': 1024,
+                    'gzip_level': 6,
+                    'brotli_quality': 4
+                }
             },
             'frontend': {
                 'port': 5173,
@@ -109,9 +152,10 @@ class Config:
                 'mode': 'development',
                 'clean_after_build': True,
                 'pyinstaller': {
-                    'onefile': True,
+                    'onefile': False,
                     'windowed': True,
-                    'icon': None
+                    'icon': None,
+                    'exclude_modules': []
                 }
             },
             'development': {
@@ -126,7 +170,8 @@ class Config:
             'logging': {
                 'level': 'INFO',
                 'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                'file': None
+                'file': None,
+                'buffer_lines': 1000
             }
         }
         
@@ -248,6 +293,11 @@ class Config:
         return self.get('development.service_timeout', 30)
     
     # Métodos helper
+    def log(self, message: str):
+        """Muestra un mensaje informativo solo en modo debug"""
+        if self.debug_mode:
+            print(f"ℹ️ {message}")
+    
     def is_backend_mode(self) -> bool:
         """Verifica si el modo incluye backend"""
         return self.mode in ['backend', 'full']
@@ -49,11 +49,17 @@ def create_yaml_config(mode: str = "frontend", interactive: bool = False):
             backend_host = input("Host del backend [localhost]: ").strip() or "localhost"
             backend_debug = input("Modo debug (y/n) [n]: ").strip().lower() or "n"
             backend_reload = input("Auto-reload (y/n) [y]: ").strip().lower() or "y"
+            backend_workers = input("Procesos del servidor (workers) [1]: ").strip() or "1"
+            backend_loop = input("Event loop (auto/asyncio/uvloop) [auto]: ").strip() or "auto"
+            backend_http = input("Protocolo HTTP (auto/h11/httptools) [auto]: ").strip() or "auto"
         else:
             backend_port = "8000"
             backend_host = "localhost"
             backend_debug = "n"
             backend_reload = "y"
+            backend_workers = "1"
+            backend_loop = "auto"
+            backend_http = "auto"
         
         # Configuración del frontend
         if mode in ["frontend", "full"]:
@@ -94,6 +100,9 @@ def create_yaml_config(mode: str = "frontend", interactive: bool = False):
         backend_host = "localhost"
         backend_debug = "n"
         backend_reload = "y"
+        backend_workers = "1"
+        backend_loop = "auto"
+        backend_http = "auto"
         frontend_port = "5173"
         frontend_host = "localhost"
         frontend_hot_reload = "y"
@@ -124,7 +133,10 @@ def create_yaml_config(mode: str = "frontend", interactive: bool = False):
             'port': to_int(backend_port),
             'host': backend_host,
             'debug': to_bool(backend_debug),
-            'reload': to_bool(backend_reload)
+            'reload': to_bool(backend_reload),
+            'workers': max(1, int(backend_workers)) if backend_workers.isdigit() else 1,
+            'loop': backend_loop,
+            'http': backend_http
         },
         'frontend': {
             'port': to_int(frontend_port),
@@ -136,9 +148,10 @@ def create_yaml_config(mode: str = "frontend", interactive: bool = False):
             'mode': build_mode,
             'clean_after_build': to_bool(clean_build),
             'pyinstaller': {
-                'onefile': True,
+                'onefile': False,
                 'windowed': True,
-                'icon': None
+                'icon': None,
+                'exclude_modules': []
             }
         },
         'development': {
@@ -153,7 +166,8 @@ def create_yaml_config(mode: str = "frontend", interactive: bool = False):
         'logging': {
             'level': log_level,
             'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            'file': None
+            'file': None,
+            'buffer_lines': 1000
         }
     }
     
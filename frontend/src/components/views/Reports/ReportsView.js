@@ -1,4 +1,6 @@
 // Vista de Reportes
+const BACKEND_URL = 'http://localhost:8000';
+
 export const getReportsContent = () => {
     return `
         <div class="content-card">
@@ -6,6 +8,31 @@ export const getReportsContent = () => {
                 <h2 class="card-title">Reportes</h2>
             </div>
             <div class="card-content">
+                <div class="buttons mb-4" id="reportButtons">
+                    <a class="button is-light" href="${BACKEND_URL}/reports/sales.pdf?grain=month&by=store" target="_blank">
+                        <span class="icon"><i class="fas fa-file-pdf"></i></span><span>Ventas por tienda</span>
+                    </a>
+                    <a class="button is-light" href="${BACKEND_URL}/reports/inventory.pdf" target="_blank">
+                        <span class="icon"><i class="fas fa-file-pdf"></i></span><span>Inventario</span>
+                    </a>
+                    <a class="button is-light" href="${BACKEND_URL}/reports/balances.pdf" target="_blank">
+                        <span class="icon"><i class="fas fa-file-pdf"></i></span><span>Saldos y antigüedad</span>
+                    </a>
+                </div>
+                <div class="buttons mb-4" id="exportButtons">
+                    <a class="button is-light" href="${BACKEND_URL}/export/sales.xlsx">
+                        <span class="icon"><i class="fas fa-file-excel"></i></span><span>Exportar ventas</span>
+                    </a>
+                    <a class="button is-light" href="${BACKEND_URL}/export/inventory.xlsx">
+                        <span class="icon"><i class="fas fa-file-excel"></i></span><span>Exportar inventario</span>
+                    </a>
+                    <a class="button is-light" href="${BACKEND_URL}/export/customers.xlsx">
+                        <span class="icon"><i class="fas fa-file-excel"></i></span><span>Exportar clientes</span>
+                    </a>
+                    <a class="button is-light" href="${BACKEND_URL}/export/balances.xlsx">
+                        <span class="icon"><i class="fas fa-file-excel"></i></span><span>Exportar saldos</span>
+                    </a>
+                </div>
                 <div class="indicator-area" id="indicatorArea">
                     <div class="has-text-centered">
                         <i class="fas fa-file-alt fa-3x has-text-grey-light mb-4"></i>
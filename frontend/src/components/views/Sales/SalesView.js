@@ -1,3 +1,5 @@
+import { Utils } from '../../../utils/utils.js'
+
 // Vista de Ventas
 export const getSalesContent = () => {
     return `
@@ -6,6 +8,11 @@ export const getSalesContent = () => {
                 <h2 class="card-title">Ventas</h2>
             </div>
             <div class="card-content">
+                <div class="field has-addons mb-4" id="salesGrainSelector">
+                    <p class="control"><button class="button is-small" data-grain="day">Día</button></p>
+                    <p class="control"><button class="button is-small" data-grain="week">Semana</button></p>
+                    <p class="control"><button class="button is-small is-info is-selected" data-grain="month">Mes</button></p>
+                </div>
                 <div class="indicator-area" id="indicatorArea">
                     <div class="has-text-centered">
                         <i class="fas fa-chart-line fa-3x has-text-grey-light mb-4"></i>
@@ -18,8 +25,74 @@ export const getSalesContent = () => {
     `;
 };
 
+const BACKEND_URL = 'http://localhost:8000';
+
+// Puntos máximos por serie: el servidor reduce la serie conservando su forma
+const MAX_POINTS = 1500;
+
+const formatCents = (cents) => (cents / 100).toLocaleString('es-ES', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+
+// Barras horizontales con el total vendido por periodo
+const renderSalesIndicator = (values) => {
+    const area = document.getElementById('indicatorArea');
+    if (!area) return;
+    if (!values.length) {
+        area.innerHTML = `
+            <div class="has-text-centered">
+                <i class="fas fa-chart-line fa-3x has-text-grey-light mb-4"></i>
+                <h3 class="title is-4 has-text-grey">Indicador de Ventas</h3>
+                <p class="subtitle is-6 has-text-grey-light">Aún no hay ventas cargadas</p>
+            </div>
+        `;
+        return;
+    }
+    const max = Math.max(...values.map((row) => row.amount_cents), 1);
+    area.innerHTML = values.map((row) => `
+        <div class="sales-bar-row">
+            <span class="sales-bar-label">${row.period}</span>
+            <progress class="progress is-info" value="${row.amount_cents}" max="${max}"></progress>
+            <span class="sales-bar-value">${formatCents(row.amount_cents)}</span>
+        </div>
+    `).join('');
+};
+
+let currentGrain = 'month';
+let unsubscribeChanges = null;
+
+// El backend responde desde el cubo precalculado (/sales/indicator)
+const loadSalesIndicator = async (grain = currentGrain) => {
+    currentGrain = grain;
+    const data = await Utils.fetchJson(`${BACKEND_URL}/sales/indicator?grain=${grain}&max_points=${MAX_POINTS}`);
+    if (data) renderSalesIndicator(data.values);
+};
+
 export const initializeSalesView = () => {
-    // Inicializar funcionalidades específicas de la vista de Ventas
+    const selector = document.getElementById('salesGrainSelector');
+    if (selector) {
+        selector.querySelectorAll('button[data-grain]').forEach((button) => {
+            button.addEventListener('click', () => {
+                selector.querySelectorAll('button').forEach((b) => b.classList.remove('is-info', 'is-selected'));
+                button.classList.add('is-info', 'is-selected');
+                loadSalesIndicator(button.dataset.grain);
+            });
+        });
+    }
+    loadSalesIndicator('month');
+
+    // Recarga el indicador cuando llegan ventas nuevas; se da de baja al salir de la vista
+    if (unsubscribeChanges) unsubscribeChanges();
+    const reloadIfVisible = () => {
+        if (document.getElementById('salesGrainSelector')) {
+            loadSalesIndicator();
+        } else if (unsubscribeChanges) {
+            unsubscribeChanges();
+            unsubscribeChanges = null;
+        }
+    };
+    unsubscribeChanges = Utils.subscribeChanges(BACKEND_URL, reloadIfVisible, {
+        topics: ['sales'],
+        onResync: reloadIfVisible
+    });
     console.log('Vista de Ventas inicializada');
 };
 
@@ -46,6 +46,12 @@ export const getTestContent = () => {
                         </div>
                     </div>
                     
+                    <div class="field" id="testProgressArea" style="display: none;">
+                        <label class="label">Progreso de la ingesta</label>
+                        <progress class="progress is-primary" id="testProgressBar" max="100"></progress>
+                        <p class="help" id="testProgressText"></p>
+                    </div>
+
                     <div class="field" id="testResponseArea" style="display: none;">
                         <label class="label">Respuesta del Backend</label>
                         <div class="control">
@@ -109,9 +115,60 @@ const initializeTestSection = () => {
     }
 };
 
+const BACKEND_URL = 'http://localhost:8000';
+
+// Texto de progreso: etapa, filas procesadas y tiempo estimado restante
+const formatJobProgress = (job) => {
+    const rows = job.total_rows
+        ? `${job.rows.toLocaleString('es-ES')} / ${job.total_rows.toLocaleString('es-ES')} filas`
+        : `${job.rows.toLocaleString('es-ES')} filas`;
+    const eta = job.eta_seconds != null ? ` · faltan ~${Math.ceil(job.eta_seconds)} s` : '';
+    return `Etapa: ${job.stage} · ${rows}${eta}`;
+};
+
+const updateJobProgress = (job) => {
+    const progressBar = document.getElementById('testProgressBar');
+    const progressText = document.getElementById('testProgressText');
+    if (!progressBar || !progressText) return;
+
+    if (job.progress != null) {
+        progressBar.value = Math.round(job.progress * 100);
+    } else {
+        // Sin estimación de filas: barra indeterminada
+        progressBar.removeAttribute('value');
+    }
+    progressText.textContent = formatJobProgress(job);
+};
+
+// Sigue el trabajo por Server-Sent Events hasta que termina
+const watchIngestJob = (jobId) => {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${BACKEND_URL}/jobs/${jobId}/events`);
+
+        source.addEventListener('progress', (event) => {
+            updateJobProgress(JSON.parse(event.data));
+        });
+        source.addEventListener('done', (event) => {
+            source.close();
+            const job = JSON.parse(event.data);
+            updateJobProgress(job);
+            resolve(job);
+        });
+        source.addEventListener('error', (event) => {
+            source.close();
+            if (event.data) {
+                reject(new Error(JSON.parse(event.data).error));
+            } else {
+                reject(new Error('Se perdió la conexión con el backend'));
+            }
+        });
+    });
+};
+
 const sendExcelToBackend = async () => {
     const fileInput = document.getElementById('excelFileInput');
     const sendBtn = document.getElementById('sendTestBtn');
+    const progressArea = document.getElementById('testProgressArea');
     const responseArea = document.getElementById('testResponseArea');
     const errorArea = document.getElementById('testErrorArea');
     const responseContent = document.getElementById('testResponseContent');
@@ -127,22 +184,21 @@ const sendExcelToBackend = async () => {
     }
 
     try {
-        // Mostrar estado de carga
-        sendBtn.classList.add('is-loading');
+        // Deshabilitar el botón mientras el trabajo está en curso
         sendBtn.disabled = true;
         
         // Ocultar áreas de respuesta y error anteriores
         responseArea.style.display = 'none';
         errorArea.style.display = 'none';
+        progressArea.style.display = 'block';
+        updateJobProgress({ stage: 'subiendo', rows: 0, progress: null });
 
         // Crear FormData para enviar el archivo
         const formData = new FormData();
         formData.append('file', file);
-        formData.append('timestamp', new Date().toISOString());
-        formData.append('source', 'tuya-frontend');
 
-        // Realizar petición POST al backend
-        const response = await fetch('http://localhost:8000/test', {
+        // Encolar la ingesta: el backend responde de inmediato con el id del trabajo
+        const response = await fetch(`${BACKEND_URL}/jobs`, {
             method: 'POST',
             body: formData
         });
@@ -151,18 +207,22 @@ const sendExcelToBackend = async () => {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        const submitted = await response.json();
+        updateJobProgress(submitted);
+        const job = await watchIngestJob(submitted.id);
+        const data = job.result;
         
         // Mostrar respuesta exitosa
         responseContent.innerHTML = `
             <div class="has-text-success">
                 <i class="fas fa-check-circle"></i>
-                <strong>Archivo Excel enviado exitosamente:</strong>
+                <strong>Archivo Excel procesado exitosamente:</strong>
             </div>
             <div class="mt-2">
                 <p><strong>Archivo:</strong> ${file.name}</p>
                 <p><strong>Tamaño:</strong> ${(file.size / 1024).toFixed(2)} KB</p>
                 <p><strong>Tipo:</strong> ${file.type || 'No especificado'}</p>
+                <p><strong>Filas:</strong> ${data.rows.toLocaleString('es-ES')}</p>
             </div>
             <div class="mt-3">
                 <strong>Respuesta del backend:</strong>
@@ -171,7 +231,7 @@ const sendExcelToBackend = async () => {
         `;
         responseArea.style.display = 'block';
         
-        Utils.showNotification('Archivo Excel enviado exitosamente al backend', 'success');
+        Utils.showNotification('Archivo Excel procesado exitosamente', 'success');
 
     } catch (error) {
         console.error('Error enviando archivo al backend:', error);
@@ -179,16 +239,16 @@ const sendExcelToBackend = async () => {
         // Mostrar error
         errorContent.innerHTML = `
             <i class="fas fa-exclamation-triangle"></i>
-            <strong>Error al enviar archivo al backend:</strong><br>
+            <strong>Error al procesar el archivo en el backend:</strong><br>
             ${error.message}
         `;
         errorArea.style.display = 'block';
+        progressArea.style.display = 'none';
         
         Utils.showNotification('Error al enviar archivo al backend', 'danger');
 
     } finally {
         // Restaurar estado del botón
-        sendBtn.classList.remove('is-loading');
         sendBtn.disabled = false;
     }
 };
@@ -32,19 +32,70 @@ const removeFromLocalStorage = (key) => {
 };
 
 // Fetch JSON con manejo de errores
+// Las respuestas con ETag se guardan en localStorage; la siguiente petición
+// envía If-None-Match y, si los datos no cambiaron (304), se usa la copia guardada
+const ETAG_PREFIX = 'etag:';
+
 const fetchJson = async (url) => {
     try {
-        const response = await fetch(url);
+        const cached = getFromLocalStorage(ETAG_PREFIX + url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        const response = await fetch(url, { headers });
+        if (response.status === 304 && cached) {
+            return cached.body;
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return await response.json();
+        const body = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag && !saveToLocalStorage(ETAG_PREFIX + url, { etag, body })) {
+            // Sin espacio en localStorage: no se guarda una etiqueta sin su cuerpo
+            removeFromLocalStorage(ETAG_PREFIX + url);
+        }
+        return body;
     } catch (error) {
         console.error(`Error fetching ${url}:`, error);
         return null;
     }
 };
 
+// Cambios en vivo del backend (Server-Sent Events en /events)
+// Una sola conexión por backend compartida por todos los suscriptores; el
+// navegador reconecta solo y el servidor reanuda desde el último evento recibido
+const changeSources = new Map();
+
+const subscribeChanges = (baseUrl, onChange, { topics = null, onResync = null } = {}) => {
+    let shared = changeSources.get(baseUrl);
+    if (!shared) {
+        const source = new EventSource(`${baseUrl}/events`);
+        shared = { source, listeners: new Set() };
+        source.addEventListener('change', (event) => {
+            const change = JSON.parse(event.data);
+            shared.listeners.forEach((listener) => {
+                if (!listener.topics || listener.topics.some((topic) => change.tables.includes(topic))) {
+                    listener.onChange(change);
+                }
+            });
+        });
+        // El cliente se quedó atrás y se perdieron cambios: hay que recargar todo
+        source.addEventListener('resync', () => {
+            shared.listeners.forEach((listener) => listener.onResync && listener.onResync());
+        });
+        changeSources.set(baseUrl, shared);
+    }
+    const listener = { topics, onChange, onResync };
+    shared.listeners.add(listener);
+
+    return () => {
+        shared.listeners.delete(listener);
+        if (shared.listeners.size === 0) {
+            shared.source.close();
+            changeSources.delete(baseUrl);
+        }
+    };
+};
+
 // Sanitización de entrada
 const sanitizeInput = (input) => {
     if (typeof input !== 'string') return '';
@@ -286,6 +337,7 @@ export const Utils = {
     
     // Fetch y validación
     fetchJson,
+    subscribeChanges,
     sanitizeInput,
     isValidInput,
     
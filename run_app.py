@@ -4,7 +4,11 @@ Script unificado para ejecutar Cubo App
 Controlado por config.env
 """
 import os
+import re
 import sys
+import queue
+import logging
+import logging.handlers
 import platform
 import subprocess
 import webbrowser
@@ -12,16 +16,105 @@ import time
 import signal
 import threading
 import requests
+from collections import deque
 from pathlib import Path
 
 # Importar configuración
 from config import config
 
+PROJECT_DIR = Path(__file__).parent
+DEFAULT_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# uvicorn empieza sus líneas con el nivel ("INFO:     ...", "ERROR:    ...")
+LEVEL_PREFIX = re.compile(r'^(DEBUG|INFO|WARNING|ERROR|CRITICAL):')
+
+class LogPump:
+    """
+    Vacía sin pausa stdout y stderr de los procesos hijos (un hilo por flujo),
+    así un uvicorn o un Vite muy habladores nunca llenan el búfer de la tubería
+    y se bloquean. Cada línea:
+
+    - se guarda en un búfer circular en memoria (logging.buffer_lines)
+    - se envía a una cola de logging (QueueHandler); un único hilo la escribe
+      en consola con el nombre del servicio delante y, si está configurado,
+      en logging.file. Los hilos lectores nunca esperan a la consola ni al disco.
+    """
+
+    def __init__(self, buffer_lines=1000, level='INFO', log_file=None, log_format=DEFAULT_LOG_FORMAT):
+        self.lines = deque(maxlen=max(1, int(buffer_lines)))
+        self._lock = threading.Lock()
+        self._threads = []
+        self._queue = queue.SimpleQueue()
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter('[%(service)s] %(message)s'))
+        handlers = [console]
+        if log_file:
+            log_path = Path(log_file)
+            if not log_path.is_absolute():
+                log_path = PROJECT_DIR / log_path
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.FileHandler(log_path, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter(log_format))
+            handlers.append(file_handler)
+        self._listener = logging.handlers.QueueListener(self._queue, *handlers)
+
+        self.logger = logging.getLogger('cubo_app')
+        self.logger.setLevel(str(level).upper())
+        self.logger.propagate = False
+        self.logger.handlers = [logging.handlers.QueueHandler(self._queue)]
+        self._listener.start()
+
+    def attach(self, service, process):
+        """Empieza a leer stdout y stderr de un proceso lanzado con stdout/stderr=PIPE"""
+        for stream_name, stream in (('stdout', process.stdout), ('stderr', process.stderr)):
+            if stream is None:
+                continue
+            thread = threading.Thread(target=self._pump, args=(service, stream_name, stream),
+                                      name=f"log-{service}-{stream_name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _pump(self, service, stream_name, stream):
+        logger = self.logger.getChild(service)
+        with stream:
+            for raw in iter(stream.readline, b''):
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                with self._lock:
+                    self.lines.append((time.time(), service, stream_name, line))
+                match = LEVEL_PREFIX.match(line)
+                level = logging.getLevelName(match.group(1)) if match else logging.INFO
+                logger.log(level, line, extra={'service': service, 'stream': stream_name})
+
+    def tail(self, service=None, count=20):
+        """Últimas líneas del búfer (de un servicio o de todos)"""
+        with self._lock:
+            selected = [line for _, name, _, line in self.lines if service is None or name == service]
+        return selected[-count:]
+
+    def print_tail(self, service, count=20):
+        lines = self.tail(service, count)
+        if lines:
+            print(f"📜 Últimas líneas de {service}:")
+            for line in lines:
+                print(f"   {line}")
+
+    def stop(self, timeout=2):
+        """Espera a que los lectores lleguen al final de sus flujos y vacía la cola"""
+        for thread in self._threads:
+            thread.join(timeout)
+        self._listener.stop()
+
 class CuboAppUnified:
     def __init__(self):
         self.backend_process = None
         self.frontend_process = None
         self.is_running = False
+        self.log_pump = LogPump(
+            buffer_lines=config.get('logging.buffer_lines', 1000),
+            level=config.get('logging.level', 'INFO'),
+            log_file=config.get('logging.file'),
+            log_format=config.get('logging.format', DEFAULT_LOG_FORMAT),
+        )
         
     def detect_wsl(self):
         """Detecta si estamos en WSL"""
@@ -120,6 +213,7 @@ class CuboAppUnified:
             self.backend_process = subprocess.Popen([
                 python_executable, str(server_script)
             ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.log_pump.attach('backend', self.backend_process)
             
             self.is_running = True
             print(f"✅ Backend iniciado en {config.get_backend_url()}")
@@ -138,6 +232,10 @@ class CuboAppUnified:
         start_time = time.time()
         
         while time.time() - start_time < timeout:
+            if self.backend_process is not None and self.backend_process.poll() is not None:
+                print("❌ El backend se detuvo")
+                self.log_pump.print_tail('backend')
+                return False
             try:
                 response = requests.get(config.get_backend_url(), timeout=5)
                 if response.status_code == 200:
@@ -176,6 +274,7 @@ class CuboAppUnified:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
+            self.log_pump.attach('frontend', self.frontend_process)
             
             # Esperar a que Vite inicie
             time.sleep(5)
@@ -185,10 +284,8 @@ class CuboAppUnified:
                 self.is_running = True  # <-- Asegura que el bucle principal siga activo
                 return True
             else:
-                stdout, stderr = self.frontend_process.communicate()
                 print("❌ Error iniciando el frontend")
-                if stderr:
-                    print(f"Error: {stderr.decode()}")
+                self.log_pump.print_tail('frontend')
                 return False
                 
         except Exception as e:
@@ -294,6 +391,7 @@ class CuboAppUnified:
             except Exception as e:
                 print(f"❌ Error al detener frontend: {e}")
         
+        self.log_pump.stop()
         self.is_running = False
     
     def run(self):
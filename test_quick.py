@@ -8,8 +8,13 @@ import subprocess
 import sys
 import threading
 import platform
+import os
+import tempfile
 from pathlib import Path
 
+# Tiempo máximo (s) desde lanzar el servidor hasta la primera respuesta de /
+COLD_START_BUDGET = float(os.environ.get("CUBO_COLD_START_BUDGET", "3.0"))
+
 def check_venv():
     """Verifica que el entorno virtual existe"""
     venv_path = Path(__file__).parent / "venv"
@@ -134,6 +139,56 @@ def test_server():
         print(f"❌ Error iniciando servidor: {e}")
         return False
 
+def test_cold_start():
+    """Mide el arranque en frío: desde lanzar el servidor hasta que / responde"""
+    print(f"⏱️ Midiendo arranque en frío (presupuesto {COLD_START_BUDGET:.1f}s)...")
+
+    python_executable = check_venv()
+    if not python_executable or not check_backend_files():
+        return False
+
+    backend_dir = Path(__file__).parent / "backend"
+    server_script = backend_dir / "app" / "server.py"
+    # stderr va a un archivo temporal: una tubería que nadie lee mientras se
+    # espera a / se llenaría y bloquearía a un servidor que escriba mucho
+    stderr_file = tempfile.TemporaryFile()
+    started = time.perf_counter()
+    process = subprocess.Popen([python_executable, str(server_script)], cwd=str(backend_dir),
+                               stdout=subprocess.DEVNULL, stderr=stderr_file)
+    elapsed = None
+    try:
+        # Se espera como mucho el doble del presupuesto antes de darlo por fallido
+        while time.perf_counter() - started < COLD_START_BUDGET * 2:
+            if process.poll() is not None:
+                print("❌ El servidor se detuvo prematuramente")
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+                if stderr:
+                    print(f"Error: {stderr.decode()}")
+                return False
+            try:
+                if requests.get("http://localhost:8000/", timeout=0.5).status_code == 200:
+                    elapsed = time.perf_counter() - started
+                    break
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stderr_file.close()
+
+    if elapsed is None or elapsed > COLD_START_BUDGET:
+        measured = f"{elapsed:.2f}s" if elapsed is not None else "sin respuesta"
+        print(f"❌ Arranque en frío fuera de presupuesto: {measured} > {COLD_START_BUDGET:.1f}s")
+        print("💡 Revisa qué se importa al arrancar con: python backend/app/server.py --profile-startup")
+        return False
+    print(f"✅ Arranque en frío: {elapsed:.2f}s (presupuesto {COLD_START_BUDGET:.1f}s)")
+    return True
+
 def test_frontend():
     """Prueba si el frontend está disponible"""
     print("🎨 Verificando frontend...")
@@ -187,8 +242,12 @@ def main():
     server_ok = test_server()
     print()
     
+    # Medir el arranque en frío
+    cold_start_ok = server_ok and test_cold_start()
+    print()
+    
     # Resultados
-    if server_ok:
+    if server_ok and cold_start_ok:
         print("✅ ¡Todo funciona correctamente!")
         print("🚀 Puedes ejecutar la aplicación con:")
         print("   python run_app.py")